@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+
+# the home / draw / away odds columns that get_data provides for each price
+ODDS_COLUMNS = {
+    "max": ["home_max_odds", "draw_max_odds", "away_max_odds"],
+    "mean": ["home_mean_odds", "draw_mean_odds", "away_mean_odds"],
+    "closing": ["home_closing_odds", "draw_closing_odds", "away_closing_odds"],
+    "pinnacle": ["PSH", "PSD", "PSA"],
+}
+
+# the probability columns the walk forward backtest (process_chunk.py) adds
+PROB_COLUMNS = ["home_win_prob", "draw_win_prob", "away_win_prob"]
+
+
+def prepare_backtest(backtest: pd.DataFrame, odds="max") -> dict:
+    """
+    Sorts the backtest by date and pulls out the arrays the simulator works on: the model's H / D / A
+    probabilities, the odds, the result (0 home, 1 draw, 2 away) and where each matchday starts.
+    odds is one of ODDS_COLUMNS or a list of three column names
+    """
+    odds_columns = ODDS_COLUMNS[odds] if isinstance(odds, str) else list(odds)
+    backtest = backtest.sort_values("Date", kind="stable")
+    matchday = pd.to_datetime(backtest["Date"]).dt.normalize().to_numpy()
+    day_starts = np.flatnonzero(np.r_[True, matchday[1:] != matchday[:-1]])
+
+    return {
+        "probs": backtest[PROB_COLUMNS].to_numpy(dtype=np.float64),
+        "odds": backtest[odds_columns].to_numpy(dtype=np.float64),
+        "result": np.select(
+            [
+                backtest["FTHG"].to_numpy() > backtest["FTAG"].to_numpy(),
+                backtest["FTHG"].to_numpy() == backtest["FTAG"].to_numpy(),
+            ],
+            [0, 1],
+            2,
+        ),
+        "day_starts": day_starts,
+        "dates": matchday[day_starts],
+    }
+
+
+def select_bets(probs: np.ndarray, odds: np.ndarray):
+    """
+    The selection with the highest EV for every match (ties going to away, then draw, then home like
+    make_betting_prediction), its EV and its full Kelly fraction, which is zero for matches without prices
+    """
+    evs = probs * odds - 1
+    evs = np.where(np.isnan(evs), -np.inf, evs)
+    is_max = evs == evs.max(axis=1, keepdims=True)
+    choice = np.where(is_max[:, 2], 2, np.where(is_max[:, 1], 1, 0))
+    rows = np.arange(len(choice))
+
+    best_ev = evs[rows, choice]
+    b = odds[rows, choice] - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        full_kelly = np.where(np.isfinite(best_ev) & (b > 0), best_ev / b, 0.0)
+    return choice, best_ev, np.maximum(full_kelly, 0)
+
+
+def stake_fractions(best_ev, full_kelly, kelly_fraction, ev_threshold) -> np.ndarray:
+    """
+    The fraction of the bankroll staked on every match for each strategy, an (n_strategies, n_matches) array.
+    kelly_fraction and ev_threshold are broadcast against each other to give the strategies
+    """
+    kelly_fraction, ev_threshold = np.broadcast_arrays(
+        np.atleast_1d(kelly_fraction).astype(np.float64),
+        np.atleast_1d(ev_threshold).astype(np.float64),
+    )
+    return np.where(
+        best_ev[None] > ev_threshold.ravel()[:, None],
+        kelly_fraction.ravel()[:, None] * full_kelly[None],
+        0.0,
+    )
+
+
+def daily_returns(
+    fractions: np.ndarray, payoff: np.ndarray, day_starts, max_exposure=1.0
+) -> np.ndarray:
+    """
+    The bankroll multiplier of every matchday for each strategy. Bets on the same day are all sized from that
+    morning's bankroll and scaled down together if they'd stake more than max_exposure of it.
+    payoff is the profit per unit staked (odds - 1 for a win, -1 for a loss) and broadcasts against fractions
+    """
+    exposure = np.add.reduceat(fractions, day_starts, axis=-1)
+    # unbet matches add nothing, even if their payoff isn't finite
+    profit = np.add.reduceat(
+        np.where(fractions > 0, fractions * payoff, 0.0), day_starts, axis=-1
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(exposure > max_exposure, max_exposure / exposure, 1.0)
+    # the bankroll can't go below nothing
+    return np.maximum(1 + profit * scale, 0.0)
+
+
+def _payoff(odds: np.ndarray, choice: np.ndarray, result: np.ndarray) -> np.ndarray:
+    """
+    The profit per unit staked on every match's selection, result can be one row per simulation.
+    Matches without a price for the selection are never bet on so they pay nothing rather than NaN
+    """
+    won = choice == result
+    selected_odds = odds[np.arange(len(choice)), choice]
+    return np.where(
+        np.isfinite(selected_odds), np.where(won, selected_odds - 1, -1.0), 0.0
+    )
+
+
+def _bankroll_summary(returns: np.ndarray, initial_bankroll) -> dict:
+    """
+    Final bankroll, growth and worst drawdown of each row of daily multipliers
+    """
+    path = initial_bankroll * np.cumprod(returns, axis=-1)
+    peak = np.maximum(np.maximum.accumulate(path, axis=-1), initial_bankroll)
+    with np.errstate(divide="ignore"):
+        log_growth = np.log(path[..., -1] / initial_bankroll)
+    return {
+        "final_bankroll": path[..., -1],
+        "log_growth": log_growth,
+        "max_drawdown": np.max(1 - path / peak, axis=-1),
+    }
+
+
+def simulate_bankroll(
+    backtest: pd.DataFrame,
+    kelly_fraction=0.05,
+    ev_threshold=0.0,
+    odds="max",
+    initial_bankroll=100,
+    max_exposure=1.0,
+) -> pd.DataFrame:
+    """
+    Replays the backtest betting the best EV selection of every match with fractional Kelly stakes,
+    compounding the bankroll matchday by matchday. Returns the bankroll after each matchday
+    """
+    data = prepare_backtest(backtest, odds)
+    choice, best_ev, full_kelly = select_bets(data["probs"], data["odds"])
+    fractions = stake_fractions(best_ev, full_kelly, kelly_fraction, ev_threshold)[0]
+    payoff = _payoff(data["odds"], choice, data["result"])
+    returns = daily_returns(fractions, payoff, data["day_starts"], max_exposure)
+
+    bankroll = initial_bankroll * np.cumprod(returns)
+    return pd.DataFrame(
+        {
+            "date": data["dates"],
+            "n_bets": np.add.reduceat(fractions > 0, data["day_starts"]),
+            "staked": np.r_[initial_bankroll, bankroll[:-1]]
+            * np.minimum(np.add.reduceat(fractions, data["day_starts"]), max_exposure),
+            "bankroll": bankroll,
+        }
+    )
+
+
+def sweep_strategies(
+    backtest: pd.DataFrame,
+    kelly_fractions=(0.05, 0.1, 0.25, 0.5, 1.0),
+    ev_thresholds=(0.0, 0.02, 0.05, 0.1),
+    odds="max",
+    initial_bankroll=100,
+    max_exposure=1.0,
+) -> pd.DataFrame:
+    """
+    Replays the backtest for every combination of Kelly fraction and EV threshold at once
+    """
+    data = prepare_backtest(backtest, odds)
+    choice, best_ev, full_kelly = select_bets(data["probs"], data["odds"])
+    kelly_grid, threshold_grid = np.meshgrid(
+        kelly_fractions, ev_thresholds, indexing="ij"
+    )
+    fractions = stake_fractions(best_ev, full_kelly, kelly_grid, threshold_grid)
+    payoff = _payoff(data["odds"], choice, data["result"])
+    returns = daily_returns(fractions, payoff[None], data["day_starts"], max_exposure)
+
+    return pd.DataFrame(
+        {
+            "kelly_fraction": kelly_grid.ravel(),
+            "ev_threshold": threshold_grid.ravel(),
+            "n_bets": (fractions > 0).sum(axis=1),
+            **_bankroll_summary(returns, initial_bankroll),
+        }
+    )
+
+
+def monte_carlo_bankroll(
+    backtest: pd.DataFrame,
+    kelly_fraction=0.05,
+    ev_threshold=0.0,
+    n_sims: int = 1000,
+    method="bootstrap",
+    odds="max",
+    initial_bankroll=100,
+    max_exposure=1.0,
+    seed=None,
+) -> pd.DataFrame:
+    """
+    The spread of outcomes for one strategy over n_sims simulated seasons. "bootstrap" resamples whole
+    matchdays of the backtest with replacement, "model" keeps the fixtures but draws every result from the
+    model's own probabilities (what to expect if the model is right).
+    Returns the final bankroll, growth and worst drawdown of every simulation
+    """
+    rng = np.random.default_rng(seed)
+    data = prepare_backtest(backtest, odds)
+    choice, best_ev, full_kelly = select_bets(data["probs"], data["odds"])
+    fractions = stake_fractions(best_ev, full_kelly, kelly_fraction, ev_threshold)
+
+    if method == "bootstrap":
+        payoff = _payoff(data["odds"], choice, data["result"])
+        returns = daily_returns(
+            fractions, payoff[None], data["day_starts"], max_exposure
+        )[0]
+        n_days = len(returns)
+        returns = returns[rng.integers(0, n_days, (n_sims, n_days))]
+    elif method == "model":
+        probs = np.nan_to_num(data["probs"])
+        cumulative = np.cumsum(probs, axis=1)
+        draws = rng.random((n_sims, len(probs), 1))
+        results = (draws > cumulative[None, :, :2]).sum(axis=2)
+        payoff = _payoff(data["odds"], choice, results)
+        returns = daily_returns(fractions, payoff, data["day_starts"], max_exposure)
+    else:
+        raise ValueError(f"method must be bootstrap or model, not {method}")
+
+    return pd.DataFrame(_bankroll_summary(returns, initial_bankroll))
@@ -0,0 +1,76 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_league
+from dc_likelihood import dc_gradient, dc_log_likelihood, encode_matches, match_weights
+from dc_numba import NUMBA_AVAILABLE, NumbaObjective
+from dixon_coles import fit_encoded
+
+
+def _time_calls(func, repeats: int) -> float:
+    """
+    The mean seconds per call of func over repeats calls
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def run(n_teams: int = 20, n_rounds: int = 10, repeats: int = 200, xi: float = 0.00325):
+    """
+    Times one objective + gradient evaluation and a full fit for the numpy and numba backends
+    """
+    dataset, _ = make_league(n_teams=n_teams, n_rounds=n_rounds)
+    matches = encode_matches(dataset)
+    weights = match_weights(matches, xi)
+    params = np.concatenate(
+        (np.ones(n_teams), -np.ones(n_teams), np.array([-0.05, 0.25]))
+    )
+
+    def numpy_eval():
+        dc_log_likelihood(params, matches, weights)
+        dc_gradient(params, matches, weights)
+
+    backends = {"numpy": numpy_eval}
+    if NUMBA_AVAILABLE:
+        objective = NumbaObjective(matches, weights)
+        # the first call compiles the kernel (or loads it from numba's cache)
+        objective.value_and_grad(params)
+        backends["numba"] = lambda: objective.value_and_grad(params)
+        value, grad = objective.value_and_grad(params)
+        print(
+            "max difference from numpy:",
+            abs(value + dc_log_likelihood(params, matches, weights)),
+            np.max(np.abs(grad + dc_gradient(params, matches, weights))),
+        )
+    else:
+        print("numba isn't installed, only timing the numpy backend")
+
+    print(f"{len(matches)} matches, {n_teams} teams")
+    for backend, evaluate in backends.items():
+        per_call = _time_calls(evaluate, repeats)
+        start = time.perf_counter()
+        opt_output = fit_encoded(
+            matches,
+            weights,
+            init_vals=params,
+            options={"disp": False, "maxiter": 100},
+            backend=backend,
+        )
+        fit_time = time.perf_counter() - start
+        print(
+            f"{backend:>6}: {per_call * 1e6:9.1f}us per objective + gradient, "
+            f"fit {fit_time * 1e3:8.1f}ms ({opt_output.nit} iterations, loglik {-opt_output.fun:.4f})"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    run(n_teams=args.teams, n_rounds=args.rounds, repeats=args.repeats)
@@ -0,0 +1,131 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_league
+from dc_likelihood import encode_matches, match_weights
+from dixon_coles import fit_encoded, fit_encoded_centred, random_init_vals
+from multi_league import fit_leagues
+
+RHO_BOUNDS = (-0.2, 0.2)
+
+
+def _rho_bounds(n_teams: int, n_params: int, n_rho: int = 1) -> list:
+    """
+    The same rho bounds the centred solver uses, so the constrained solvers answer the same question
+    """
+    bounds = [(None, None)] * n_params
+    bounds[2 * n_teams : 2 * n_teams + n_rho] = [RHO_BOUNDS] * n_rho
+    return bounds
+
+
+def _timed(func):
+    start = time.perf_counter()
+    output = func()
+    return output, time.perf_counter() - start
+
+
+def compare_single_league(n_teams: int, n_rounds: int = 2, xi: float = 0.00325):
+    """
+    Fits one synthetic league with the constrained SLSQP solver and the centred L-BFGS-B one from the same start.
+    Both get the same rho bounds
+    """
+    dataset, _ = make_league(n_teams=n_teams, n_rounds=n_rounds)
+    matches = encode_matches(dataset)
+    weights = match_weights(matches, xi)
+    np.random.seed(0)
+    init_vals = random_init_vals(matches)
+
+    slsqp, slsqp_time = _timed(
+        lambda: fit_encoded(
+            matches,
+            weights,
+            init_vals=init_vals,
+            options={"disp": False, "maxiter": 1000},
+            bounds=_rho_bounds(n_teams, matches.n_params),
+        )
+    )
+    lbfgsb, lbfgsb_time = _timed(
+        lambda: fit_encoded_centred(
+            matches, weights, init_vals=init_vals, rho_bounds=RHO_BOUNDS
+        )
+    )
+    return {
+        "case": f"{n_teams} teams",
+        "n_params": matches.n_params,
+        "slsqp_s": slsqp_time,
+        "lbfgsb_s": lbfgsb_time,
+        "speedup": slsqp_time / lbfgsb_time,
+        "slsqp_nit": slsqp.nit,
+        "lbfgsb_nit": lbfgsb.nit,
+        "loglik_diff": slsqp.fun - lbfgsb.fun,
+        "max_param_diff": np.max(np.abs(slsqp.x - lbfgsb.x)),
+    }
+
+
+def compare_multi_league(league_sizes=(20, 24, 24, 24), n_rounds: int = 2):
+    """
+    The same comparison for a joint fit of several leagues, against both SLSQP and trust-constr
+    """
+    frames = []
+    for i, n_teams in enumerate(league_sizes):
+        frame, _ = make_league(n_teams=n_teams, n_rounds=n_rounds, seed=i, name=f"L{i}")
+        frames.append(frame.assign(Div=f"L{i}"))
+    dataset = pd.concat(frames, ignore_index=True)
+
+    n_teams, n_leagues = sum(league_sizes), len(league_sizes)
+    bounds = _rho_bounds(n_teams, 2 * n_teams + 2 * n_leagues, n_leagues)
+    rows = []
+    lbfgsb, lbfgsb_time = _timed(
+        lambda: fit_leagues(
+            dataset,
+            options={"maxiter": 1000},
+            solver="lbfgsb",
+            rho_bounds=RHO_BOUNDS,
+            debug=True,
+        )
+    )
+    for solver in ["SLSQP", "trust-constr"]:
+        constrained, constrained_time = _timed(
+            lambda: fit_leagues(
+                dataset,
+                options={"disp": False, "maxiter": 1000},
+                solver=solver,
+                bounds=bounds,
+                debug=True,
+            )
+        )
+        rows.append(
+            {
+                "case": f"{n_leagues} leagues vs {solver}",
+                "n_params": len(lbfgsb.x),
+                "slsqp_s": constrained_time,
+                "lbfgsb_s": lbfgsb_time,
+                "speedup": constrained_time / lbfgsb_time,
+                "slsqp_nit": constrained.nit,
+                "lbfgsb_nit": lbfgsb.nit,
+                "loglik_diff": constrained.fun - lbfgsb.fun,
+                "max_param_diff": np.max(np.abs(constrained.x - lbfgsb.x)),
+            }
+        )
+    return rows
+
+
+def run(team_counts=(20, 24, 46, 92)) -> pd.DataFrame:
+    """
+    The constrained vs centred comparison for each league size and a four league joint fit.
+    slsqp_s is the constrained solver's time, a positive loglik_diff means L-BFGS-B found a better fit
+    """
+    rows = [compare_single_league(n_teams) for n_teams in team_counts]
+    rows += compare_multi_league()
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--teams", type=int, nargs="+", default=[20, 24, 46, 92])
+    args = parser.parse_args()
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(run(args.teams))
@@ -0,0 +1,303 @@
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy
+
+import data_cache
+from benchmarks.synthetic import make_league, true_model, write_season_csvs
+from bettools import get_data
+from dc_numba import NUMBA_AVAILABLE
+from dixon_coles import (
+    dixon_coles_simulate_match,
+    dixon_coles_simulate_matches,
+    get_1x2_probs,
+    solve_parameters_decay,
+)
+from markets import outcome_probs
+from utils.general_utils import predict_whole_league
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# (teams, seasons) of the synthetic leagues that are fitted, a season being every pairing home and away once
+FIT_CASES = [(20, 1), (20, 3), (24, 3), (46, 2), (92, 2)]
+QUICK_FIT_CASES = [(20, 1), (20, 3)]
+
+
+def _best_time(func, repeats: int = 5):
+    """
+    The quickest of repeats calls of func in seconds, with the output of the last call
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def bench_fit(cases=FIT_CASES, solvers=("slsqp", "lbfgsb")) -> list[dict]:
+    """
+    Fits each synthetic league with solve_parameters_decay (no time decay) and scores the fit against the
+    parameters the league was drawn from
+    """
+    rows = []
+    for n_teams, n_seasons in cases:
+        dataset, true_params = make_league(
+            n_teams, n_rounds=n_seasons, max_days=365 * n_seasons, rho=-0.05
+        )
+        for solver in solvers:
+            np.random.seed(0)
+            seconds, opt_output = _best_time(
+                lambda: solve_parameters_decay(
+                    dataset,
+                    xi=0.0,
+                    debug=True,
+                    options={"disp": False, "maxiter": 1000},
+                    solver=solver,
+                ),
+                repeats=1,
+            )
+            x = opt_output.x
+            rows.append(
+                {
+                    "benchmark": "fit",
+                    "case": f"{solver} {n_teams} teams x {n_seasons} seasons",
+                    "seconds": seconds,
+                    "items_per_s": len(dataset) / seconds,
+                    "nit": int(opt_output.nit),
+                    "converged": bool(opt_output.success),
+                    "attack_rmse": np.sqrt(
+                        np.mean((x[:n_teams] - true_params["attack"]) ** 2)
+                    ),
+                    "defence_rmse": np.sqrt(
+                        np.mean(
+                            (x[n_teams : 2 * n_teams] - true_params["defence"]) ** 2
+                        )
+                    ),
+                    "rho_error": x[2 * n_teams] - true_params["rho"],
+                    "home_adv_error": x[2 * n_teams + 1] - true_params["home_adv"],
+                }
+            )
+    return rows
+
+
+def bench_simulate(n_fixtures: int = 2000) -> list[dict]:
+    """
+    Fixtures priced per second one at a time with dixon_coles_simulate_match + get_1x2_probs
+    (from a parameter dictionary and from a DixonColesModel) and all at once with dixon_coles_simulate_matches
+    """
+    _, true_params = make_league(20, rho=-0.05)
+    model = true_model(true_params)
+    params_dict = model.to_params_dict()
+    rng = np.random.default_rng(0)
+    home, away = rng.choice(model.teams, (2, n_fixtures))
+    keep = home != away
+    home, away = home[keep], away[keep]
+
+    cases = {
+        "simulate_match + get_1x2_probs (dict)": lambda: [
+            get_1x2_probs(dixon_coles_simulate_match(params_dict, h, a))
+            for h, a in zip(home, away)
+        ],
+        "simulate_match + get_1x2_probs (model)": lambda: [
+            get_1x2_probs(dixon_coles_simulate_match(model, h, a))
+            for h, a in zip(home, away)
+        ],
+        "simulate_matches + outcome_probs (batched)": lambda: outcome_probs(
+            dixon_coles_simulate_matches(model, home, away)
+        ),
+    }
+    rows = []
+    for case, func in cases.items():
+        seconds, _ = _best_time(func, repeats=3)
+        rows.append(
+            {
+                "benchmark": "simulate",
+                "case": case,
+                "seconds": seconds,
+                "items_per_s": len(home) / seconds,
+            }
+        )
+    return rows
+
+
+def bench_predict(fixture_counts=(10, 380, 5000)) -> list[dict]:
+    """
+    predict_whole_league latency with two models, for a matchday, a season and a large backtest
+    """
+    _, true_params = make_league(20, rho=-0.05)
+    model = true_model(true_params)
+    # a second model a little off the true one, like the two seasons' fits predict_whole_league is given
+    rng = np.random.default_rng(1)
+    other = model.to_params_dict()
+    other.update({key: value + rng.normal(0, 0.05) for key, value in other.items()})
+    params_list = [model.to_params_dict(), other]
+
+    rows = []
+    for n_fixtures in fixture_counts:
+        home, away = rng.choice(model.teams, (2, n_fixtures))
+        away = np.where(home == away, np.roll(model.teams, 1)[model.encode(home)], away)
+        df = pd.DataFrame(
+            {
+                "home": home,
+                "away": away,
+                "home_odds": rng.uniform(1.5, 4, n_fixtures),
+                "draw_odds": rng.uniform(3, 4.5, n_fixtures),
+                "away_odds": rng.uniform(1.8, 6, n_fixtures),
+            }
+        )
+        seconds, _ = _best_time(lambda: predict_whole_league(df.copy(), params_list))
+        rows.append(
+            {
+                "benchmark": "predict_whole_league",
+                "case": f"{n_fixtures} fixtures",
+                "seconds": seconds,
+                "items_per_s": n_fixtures / seconds,
+            }
+        )
+    return rows
+
+
+def bench_get_data(
+    seasons=("2122", "2223", "2324"), leagues=("E0", "E1", "SP1", "D1")
+) -> list[dict]:
+    """
+    get_data on synthetic football-data csvs in a temporary directory, cold (copied into an empty cache)
+    and warm (already cached), so it's only the reading and parsing that's measured, not the network
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        write_season_csvs(Path(root) / "source", seasons, leagues)
+        base_url, cache_dir = data_cache.BASE_URL, data_cache.CACHE_DIR
+        data_cache.BASE_URL = str(Path(root) / "source")
+        try:
+            cold = float("inf")
+            for run in range(3):
+                data_cache.CACHE_DIR = str(Path(root) / f"cache_{run}")
+                start = time.perf_counter()
+                df = get_data(list(seasons), list(leagues))
+                cold = min(cold, time.perf_counter() - start)
+            warm, df = _best_time(lambda: get_data(list(seasons), list(leagues)))
+        finally:
+            data_cache.BASE_URL, data_cache.CACHE_DIR = base_url, cache_dir
+
+    for case, seconds in [("cold cache", cold), ("warm cache", warm)]:
+        rows.append(
+            {
+                "benchmark": "get_data",
+                "case": f"{case} {len(seasons)} seasons x {len(leagues)} leagues",
+                "seconds": seconds,
+                "items_per_s": len(df) / seconds,
+            }
+        )
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick: bool = False) -> dict:
+    """
+    Runs every benchmark, returning the machine / version details with a row per (benchmark, case).
+    quick only fits the smaller leagues
+    """
+    results = []
+    results += bench_fit(QUICK_FIT_CASES if quick else FIT_CASES)
+    results += bench_simulate()
+    results += bench_predict()
+    results += bench_get_data()
+    return {
+        "metadata": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _git_commit(),
+            "quick": quick,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "pandas": pd.__version__,
+            "numba": NUMBA_AVAILABLE,
+            "machine": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+def save_results(output: dict, results_dir=RESULTS_DIR) -> Path:
+    """
+    Writes a run to results_dir as {time}_{commit}.json, returning the path
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    meta = output["metadata"]
+    name = meta["created_at"].replace(":", "").replace("-", "")
+    path = results_dir / f"{name}_{meta['commit'] or 'unknown'}.json"
+    with open(path, "w") as f:
+        json.dump(output, f, indent=1, default=float)
+    return path
+
+
+def load_results(path) -> pd.DataFrame:
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)["results"])
+
+
+def compare(baseline, current) -> pd.DataFrame:
+    """
+    The seconds of every (benchmark, case) in two saved runs side by side. A ratio above one means
+    the current run is slower
+    """
+    merged = pd.merge(
+        load_results(baseline)[["benchmark", "case", "seconds"]],
+        load_results(current)[["benchmark", "case", "seconds"]],
+        on=["benchmark", "case"],
+        how="outer",
+        suffixes=("_baseline", "_current"),
+    )
+    merged["ratio"] = merged["seconds_current"] / merged["seconds_baseline"]
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs the benchmark suite and saves the results"
+    )
+    parser.add_argument("--quick", action="store_true", help="only fit small leagues")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const="latest",
+        help="a saved run to compare against, by default the newest one in results-dir",
+    )
+    args = parser.parse_args()
+
+    baseline = args.compare
+    if baseline == "latest":
+        saved = sorted(Path(args.results_dir).glob("*.json"))
+        baseline = saved[-1] if saved else None
+
+    output = run(quick=args.quick)
+    path = save_results(output, args.results_dir)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(pd.DataFrame(output["results"]))
+        print(f"saved to {path}")
+        if baseline is not None:
+            print(compare(baseline, path))
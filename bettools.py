@@ -1,7 +1,14 @@
+import warnings
+
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
-from scipy.stats import poisson
+
+from downloader import fetch_many
+from markets import outcome_probs
+from match_store import compact_dtypes
+from poisson_tables import poisson_pmf_table
+from profiling import instrument, n_rows
 
 
 def generate_seasons(start_year: int, end_year: int) -> list[int]:
@@ -19,107 +26,157 @@ def generate_seasons(start_year: int, end_year: int) -> list[int]:
     return seasons
 
 
+# The bookmakers whose 1x2 prices are compared to get the best and average odds
+BOOKMAKERS = ["B365", "BW", "IW", "PS", "WH", "VC"]
+
+# The bookmakers with over / under 2.5 goals prices (P is Pinnacle)
+TOTALS_BOOKMAKERS = ["B365", "P"]
+
+# The columns get_data returns before any additional_cols
+COLUMNS = [
+    "Div",
+    "season",
+    "Date",
+    "HomeTeam",
+    "AwayTeam",
+    "FTHG",
+    "FTAG",
+    "PSH",
+    "PSD",
+    "PSA",
+    "home_max_odds",
+    "away_max_odds",
+    "draw_max_odds",
+    "home_mean_odds",
+    "away_mean_odds",
+    "draw_mean_odds",
+    "home_closing_odds",
+    "away_closing_odds",
+    "draw_closing_odds",
+    "over_max_odds",
+    "under_max_odds",
+    "over_mean_odds",
+    "under_mean_odds",
+    "over_closing_odds",
+    "under_closing_odds",
+]
+
+
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """
+    Parses the dd/mm/yy and dd/mm/yyyy dates used by different seasons in one pass over the whole column
+    """
+    dates = dates.astype(str)
+    short_year = dates.str.len() <= 8
+    parsed = pd.to_datetime(dates.where(~short_year), format="%d/%m/%Y")
+    parsed[short_year] = pd.to_datetime(dates[short_year], format="%d/%m/%y")
+    return parsed
+
+
+def summarise_odds(
+    df: pd.DataFrame,
+    bookmakers: list[str],
+    outcomes: list[str],
+    names: list[str],
+    closing_cols: list[str],
+) -> pd.DataFrame:
+    """
+    The best, average and Pinnacle closing odds for each outcome of a market.
+    All the bookmakers' prices are taken as one (matches, bookmakers, outcomes) array so it's a single reduction,
+    bookmakers missing from a season are just NaN
+    """
+    odds = (
+        df.reindex(
+            columns=[book + outcome for book in bookmakers for outcome in outcomes]
+        )
+        .to_numpy(dtype=np.float32)
+        .reshape(len(df), len(bookmakers), len(outcomes))
+    )
+    with warnings.catch_warnings():
+        # matches with no prices at all are left as NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        max_odds = np.nanmax(odds, axis=1)
+        mean_odds = np.nanmean(odds, axis=1)
+    closing_odds = df.reindex(columns=closing_cols).to_numpy(dtype=np.float32)
+
+    summary = {}
+    for i, name in enumerate(names):
+        summary[f"{name}_max_odds"] = max_odds[:, i]
+        summary[f"{name}_mean_odds"] = mean_odds[:, i]
+        summary[f"{name}_closing_odds"] = closing_odds[:, i]
+    return pd.DataFrame(summary, index=df.index)
+
+
+def normalise_matches(
+    frames: list[pd.DataFrame], seasons: list = None, columns: list[str] = None
+) -> pd.DataFrame:
+    """
+    Combines the raw season files into one compact dataframe.
+    The frames are concatenated first so the dates and odds are worked out once for everything,
+    then teams are stored as categories, goals as int8 and odds as float32
+    """
+    if seasons is not None:
+        frames = [
+            frame.assign(season=str(season)) for frame, season in zip(frames, seasons)
+        ]
+    df = pd.concat(frames, ignore_index=True)
+    # some files have blank rows at the end
+    df = df[df["HomeTeam"].notna()].reset_index(drop=True)
+
+    df["Date"] = parse_dates(df["Date"])
+    odds = pd.concat(
+        [
+            summarise_odds(
+                df,
+                BOOKMAKERS,
+                ["H", "D", "A"],
+                ["home", "draw", "away"],
+                ["PSCH", "PSCD", "PSCA"],
+            ),
+            summarise_odds(
+                df,
+                TOTALS_BOOKMAKERS,
+                [">2.5", "<2.5"],
+                ["over", "under"],
+                ["PC>2.5", "PC<2.5"],
+            ),
+        ],
+        axis=1,
+    )
+    df = pd.concat([df.drop(columns=odds.columns, errors="ignore"), odds], axis=1)
+
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    df = compact_dtypes(df)
+    df["Div"] = df["Div"].astype("category")
+    return df
+
+
+@instrument(items=n_rows)
 def get_data(
     season_list: list[int], league_list: list[str], additional_cols: list[str] = []
 ) -> pd.DataFrame:
     """
     Scrape the data choosing the required columns for the leagues and seasons required
     """
+    # The season / league files are downloaded concurrently and come back in loop order
+    frames = fetch_many(season_list, league_list)
+    seasons = [season for season in season_list for league in league_list]
 
-    # Defines the columns to take
-    col_list = [
-        "Div",
-        "Date",
-        "HomeTeam",
-        "AwayTeam",
-        "FTHG",
-        "FTAG",
-        "PSH",
-        "PSD",
-        "PSA",
-        "home_max_odds",
-        "away_max_odds",
-        "draw_max_odds",
-    ]
-
-    # Adds any other columns
-    for col in additional_cols:
-        col_list.append(col)
-
-    df_ls = []
-
-    bookmakers = ["B365", "BW", "IW", "PS", "WH", "VC"]
-
-    home_cols = []
-    away_cols = []
-    draw_cols = []
-
-    #
-    for book in bookmakers:
-        home_col = book + "H"
-        home_cols.append(home_col)
-
-    for book in bookmakers:
-        away_col = book + "A"
-        away_cols.append(away_col)
-
-    for book in bookmakers:
-        draw_col = book + "D"
-        draw_cols.append(draw_col)
-
-    # For each season / league combination read in the data for the required columns
-    for season in season_list:
-        for league in league_list:
-            try:
-                df = pd.read_csv(
-                    f"https://www.football-data.co.uk/mmz4281/{season}/{league}.csv"
-                )
-            except:
-                df = pd.read_csv(
-                    f"https://www.football-data.co.uk/mmz4281/{season}/{league}.csv",
-                    encoding="latin",
-                )
-            try:
-                df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%y")
-            except ValueError:
-                df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-            existing_home_columns = [col for col in home_cols if col in df.columns]
-            existing_away_columns = [col for col in away_cols if col in df.columns]
-            existing_draw_columns = [col for col in draw_cols if col in df.columns]
-
-            df["home_max_odds"] = df[existing_home_columns].max(axis=1)
-            df["away_max_odds"] = df[existing_away_columns].max(axis=1)
-            df["draw_max_odds"] = df[existing_draw_columns].max(axis=1)
-
-            df = df[col_list]
-            df_ls.append(df)
+    main_df = normalise_matches(frames, seasons, columns=COLUMNS + additional_cols)
     print("data generated")
 
-    return df_ls
+    return main_df
 
 
 def calculate_poisson_match_outcomes(home_goals_expectation, away_goals_expectation):
     max_goals = 10
-    home_probabilities = [
-        poisson.pmf(i, home_goals_expectation) for i in range(0, max_goals + 1)
-    ]
-    away_probabilities = [
-        poisson.pmf(i, away_goals_expectation) for i in range(0, max_goals + 1)
-    ]
-
-    home_win_prob = sum(
-        home_probabilities[i] * sum(away_probabilities[:i])
-        for i in range(1, max_goals + 1)
-    )
-    draw_prob = sum(
-        home_probabilities[i] * away_probabilities[i] for i in range(max_goals + 1)
-    )
-    away_win_prob = sum(
-        away_probabilities[i] * sum(home_probabilities[:i])
-        for i in range(1, max_goals + 1)
-    )
+    home_probabilities = poisson_pmf_table(home_goals_expectation, max_goals)[0]
+    away_probabilities = poisson_pmf_table(away_goals_expectation, max_goals)[0]
+
+    probs_1x2 = outcome_probs(np.outer(home_probabilities, away_probabilities)[None])
 
-    return [home_win_prob, draw_prob, away_win_prob]
+    return [probs_1x2["H"][0], probs_1x2["D"][0], probs_1x2["A"][0]]
 
 
 def calculate_ev_from_odds(bookmaker_odds: float, your_probability: float) -> float:
@@ -196,8 +253,8 @@ def kelly_criterion(probability, odds, bankroll, kelly_fraction=1.0):
     # Calculate the fraction of the bankroll to bet, according to the Kelly Criterion
     f_star = (b * probability - q) / b
 
-    # Adjust the fraction with the specified Kelly fraction
-    f_star = max(f_star, 0) * kelly_fraction
+    # Adjust the fraction with the specified Kelly fraction, elementwise so arrays of bets work too
+    f_star = np.maximum(f_star, 0) * kelly_fraction
 
     # Calculate the amount to bet
     bet_amount = f_star * bankroll
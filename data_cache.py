@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+
+from match_store import season_from_date
+
+BASE_URL = os.environ.get(
+    "FOOTBALL_DATA_URL", "https://www.football-data.co.uk/mmz4281"
+)
+CACHE_DIR = os.environ.get("FOOTBALL_DATA_CACHE", "data/cache")
+OFFLINE = os.environ.get("FOOTBALL_DATA_OFFLINE", "0") == "1"
+
+# Past seasons never change, so only the current season's file is revalidated once it's this old
+CURRENT_SEASON_TTL = 6 * 60 * 60
+
+ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+
+_index_lock = threading.Lock()
+
+
+def _index_path(cache_dir) -> Path:
+    return Path(cache_dir) / "index.json"
+
+
+def _object_path(cache_dir, sha256: str) -> Path:
+    return Path(cache_dir) / "objects" / sha256[:2] / f"{sha256}.csv"
+
+
+def _read_index(cache_dir) -> dict:
+    try:
+        with open(_index_path(cache_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _update_index(cache_dir, key: str, entry: dict) -> None:
+    """
+    Re-reads and rewrites the index under a lock so concurrent downloads don't lose each other's entries
+    """
+    with _index_lock:
+        index = _read_index(cache_dir)
+        index[key] = entry
+        path = _index_path(cache_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+def _store_object(cache_dir, content: bytes) -> str:
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = _object_path(cache_dir, sha256)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+    return sha256
+
+
+def season_in_progress() -> str:
+    """
+    The season code for today's date, the only season whose file can still change
+    """
+    return season_from_date(pd.Series([pd.Timestamp.now()])).iloc[0]
+
+
+def season_url(season, league: str, base_url: str = None) -> str:
+    if base_url is None:
+        base_url = BASE_URL
+    return f"{base_url.rstrip('/')}/{season}/{league}.csv"
+
+
+def _fetch(url: str, entry: dict = None, timeout: float = 30, limiter=None):
+    """
+    Downloads url, sending the cached validators so an unchanged file comes back as None.
+    Local paths are supported too (for test fixtures), using the file's mtime as the validator.
+    If a limiter is given it's waited on before every network request.
+    Returns (content or None, etag, last_modified)
+    """
+    entry = entry or {}
+    if not url.startswith(("http://", "https://")):
+        mtime = str(os.stat(url).st_mtime_ns)
+        if entry.get("last_modified") == mtime:
+            return None, None, mtime
+        return Path(url).read_bytes(), None, mtime
+
+    if limiter is not None:
+        limiter.wait(url)
+    request = urllib.request.Request(url)
+    if entry.get("etag"):
+        request.add_header("If-None-Match", entry["etag"])
+    if entry.get("last_modified"):
+        request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return (
+                response.read(),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, entry.get("etag"), entry.get("last_modified")
+        raise
+
+
+def _save(cache_dir, key, url, content, etag, last_modified) -> bytes:
+    _update_index(
+        cache_dir,
+        key,
+        {
+            "url": url,
+            "sha256": _store_object(cache_dir, content),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        },
+    )
+    return content
+
+
+def fetch_season_csv(
+    season,
+    league: str,
+    cache_dir=None,
+    base_url: str = None,
+    ttl: float = CURRENT_SEASON_TTL,
+    offline: bool = None,
+    limiter=None,
+) -> bytes:
+    """
+    The raw csv for a season / league, served from the local cache where possible.
+    Past seasons are downloaded once, the current season is revalidated with its ETag / Last-Modified
+    once it's older than ttl seconds. In offline mode only the cache is used.
+    limiter is an optional HostRateLimiter (see downloader.py) applied to network requests only
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    offline = OFFLINE if offline is None else offline
+    key = f"{season}/{league}"
+    url = season_url(season, league, base_url)
+
+    entry = _read_index(cache_dir).get(key)
+    if entry is None or entry["url"] != url:
+        entry = None
+    elif not _object_path(cache_dir, entry["sha256"]).exists():
+        entry = None
+
+    if entry is None:
+        if offline:
+            raise FileNotFoundError(f"{key} isn't in the cache at {cache_dir}")
+        content, etag, last_modified = _fetch(url, limiter=limiter)
+        return _save(cache_dir, key, url, content, etag, last_modified)
+
+    path = _object_path(cache_dir, entry["sha256"])
+    is_fresh = str(season) != season_in_progress() or (
+        time.time() - entry["fetched_at"] < ttl
+    )
+    if is_fresh or offline:
+        return path.read_bytes()
+
+    try:
+        content, etag, last_modified = _fetch(url, entry, limiter=limiter)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"couldn't revalidate {url}, using the cached copy: {e}")
+        return path.read_bytes()
+    if content is None:
+        _update_index(cache_dir, key, {**entry, "fetched_at": time.time()})
+        return path.read_bytes()
+    return _save(cache_dir, key, url, content, etag, last_modified)
+
+
+def parse_season_csv(content: bytes) -> pd.DataFrame:
+    """
+    Reads the csv bytes, trying utf-8 (with or without a byte order mark) before the
+    windows and latin encodings used by the older files
+    """
+    for encoding in ENCODINGS[:-1]:
+        try:
+            text = content.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        # latin-1 can decode any bytes so this always succeeds
+        text = content.decode(ENCODINGS[-1])
+    return pd.read_csv(io.StringIO(text))
+
+
+def read_season_csv(season, league: str, **kwargs) -> pd.DataFrame:
+    """
+    The season / league csv as a dataframe, see fetch_season_csv for the caching options
+    """
+    return parse_season_csv(fetch_season_csv(season, league, **kwargs))
@@ -0,0 +1,330 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from poisson_tables import log_factorial
+from profiling import instrument, n_matches
+
+
+@dataclass
+class EncodedMatches:
+    """
+    The matches used to fit a Dixon-Coles model stored as flat numpy arrays.
+    Teams are encoded once as integer indices into the sorted `teams` array so the
+    likelihood can be evaluated for the whole dataset without any dict lookups.
+    The parameter vector is [attack x n_teams, defence x n_teams, rho x n_rho, home_adv x n_home_adv],
+    rho_param and home_adv_param are the positions of the rho / home advantage each match uses
+    (a single league has one of each, so they're always 2 * n_teams and 2 * n_teams + 1)
+    """
+
+    teams: np.ndarray
+    home_idx: np.ndarray
+    away_idx: np.ndarray
+    home_goals: np.ndarray
+    away_goals: np.ndarray
+    time_diff: np.ndarray
+    log_factorial: np.ndarray
+    is_00: np.ndarray
+    is_01: np.ndarray
+    is_10: np.ndarray
+    is_11: np.ndarray
+    rho_param: np.ndarray
+    home_adv_param: np.ndarray
+    n_rho: int = 1
+    n_home_adv: int = 1
+
+    @property
+    def n_teams(self) -> int:
+        return len(self.teams)
+
+    @property
+    def n_params(self) -> int:
+        return 2 * self.n_teams + self.n_rho + self.n_home_adv
+
+    def __len__(self) -> int:
+        return len(self.home_idx)
+
+
+def encode_matches(
+    dataset: pd.DataFrame, teams=None, rho_group=None, home_adv_group=None
+) -> EncodedMatches:
+    """
+    Encode the HomeTeam / AwayTeam / FTHG / FTAG (and time_diff if present) columns into arrays.
+    If teams isn't given it's taken as the sorted home teams, matching solve_parameters.
+    rho_group and home_adv_group optionally give every match a group (0, 1, ...) with its own rho / home advantage,
+    by default all the matches share one of each
+    """
+    if teams is None:
+        teams = np.sort(dataset["HomeTeam"].unique())
+    teams = np.asarray(teams)
+
+    home_idx = pd.Categorical(dataset["HomeTeam"], categories=teams).codes
+    away_idx = pd.Categorical(dataset["AwayTeam"], categories=teams).codes
+    if (home_idx < 0).any() or (away_idx < 0).any():
+        raise ValueError("dataset contains teams that are not in the team list")
+
+    home_goals = dataset["FTHG"].to_numpy(dtype=np.int64)
+    away_goals = dataset["FTAG"].to_numpy(dtype=np.int64)
+    if "time_diff" in dataset.columns:
+        time_diff = dataset["time_diff"].to_numpy(dtype=np.float64)
+    else:
+        time_diff = np.zeros(len(dataset))
+
+    n_teams = len(teams)
+    if rho_group is None:
+        rho_group = np.zeros(len(dataset), dtype=np.int64)
+    rho_group = np.asarray(rho_group, dtype=np.int64)
+    n_rho = int(rho_group.max()) + 1 if len(rho_group) else 1
+    if home_adv_group is None:
+        home_adv_group = np.zeros(len(dataset), dtype=np.int64)
+    home_adv_group = np.asarray(home_adv_group, dtype=np.int64)
+    n_home_adv = int(home_adv_group.max()) + 1 if len(home_adv_group) else 1
+
+    return EncodedMatches(
+        teams=teams,
+        home_idx=home_idx.astype(np.int64),
+        away_idx=away_idx.astype(np.int64),
+        home_goals=home_goals,
+        away_goals=away_goals,
+        time_diff=time_diff,
+        # log(x!) + log(y!) doesn't depend on the parameters so is only computed once
+        log_factorial=log_factorial(home_goals) + log_factorial(away_goals),
+        is_00=((home_goals == 0) & (away_goals == 0)).astype(np.float64),
+        is_01=((home_goals == 0) & (away_goals == 1)).astype(np.float64),
+        is_10=((home_goals == 1) & (away_goals == 0)).astype(np.float64),
+        is_11=((home_goals == 1) & (away_goals == 1)).astype(np.float64),
+        rho_param=2 * n_teams + rho_group,
+        home_adv_param=2 * n_teams + n_rho + home_adv_group,
+        n_rho=n_rho,
+        n_home_adv=n_home_adv,
+    )
+
+
+def match_weights(matches: EncodedMatches, xi: float = 0.0) -> np.ndarray:
+    """
+    The exponential time decay weight exp(-xi * t) for every match
+    """
+    return np.exp(-xi * matches.time_diff)
+
+
+@instrument(items=n_matches)
+def dc_log_likelihood(
+    params: np.ndarray, matches: EncodedMatches, weights: np.ndarray = None
+) -> float:
+    """
+    The (weighted) Dixon-Coles log likelihood of all the matches for the parameter vector
+    laid out as [attack x n_teams, defence x n_teams, rho, home_adv]
+    """
+    n_teams = matches.n_teams
+    attack = params[:n_teams]
+    defence = params[n_teams : (2 * n_teams)]
+    rho = params[matches.rho_param]
+    gamma = params[matches.home_adv_param]
+    h, a = matches.home_idx, matches.away_idx
+
+    log_lambda = attack[h] + defence[a] + gamma
+    log_mu = attack[a] + defence[h]
+    lambda_x, mu_y = np.exp(log_lambda), np.exp(log_mu)
+
+    # rho_correction for every match in one expression, it's 1 outside the 0-0 / 0-1 / 1-0 / 1-1 cells
+    tau = 1 + rho * (
+        -lambda_x * mu_y * matches.is_00
+        + lambda_x * matches.is_01
+        + mu_y * matches.is_10
+        - matches.is_11
+    )
+
+    log_like = (
+        np.log(tau)
+        + matches.home_goals * log_lambda
+        - lambda_x
+        + matches.away_goals * log_mu
+        - mu_y
+        - matches.log_factorial
+    )
+    if weights is not None:
+        log_like = weights * log_like
+    return np.sum(log_like)
+
+
+def _match_terms(params: np.ndarray, matches: EncodedMatches) -> dict:
+    """
+    The per match quantities shared by the likelihood derivatives.
+    eta_1 = log(lambda) and eta_2 = log(mu) are the linear predictors for home and away goals,
+    q_1 / q_2 / q_rho are the derivatives of log(tau) with respect to eta_1, eta_2 and rho
+    """
+    n_teams = matches.n_teams
+    attack = params[:n_teams]
+    defence = params[n_teams : (2 * n_teams)]
+    rho = params[matches.rho_param]
+    gamma = params[matches.home_adv_param]
+    h, a = matches.home_idx, matches.away_idx
+
+    lambda_x = np.exp(attack[h] + defence[a] + gamma)
+    mu_y = np.exp(attack[a] + defence[h])
+
+    p_00 = lambda_x * mu_y * matches.is_00
+    # c is d(tau)/d(rho), c_1 and c_2 are its derivatives with respect to eta_1 and eta_2
+    c_1 = -p_00 + lambda_x * matches.is_01
+    c_2 = -p_00 + mu_y * matches.is_10
+    c = c_1 + mu_y * matches.is_10 - matches.is_11
+    tau = 1 + rho * c
+
+    return {
+        "rho": rho,
+        "lambda": lambda_x,
+        "mu": mu_y,
+        "p_00": p_00,
+        "c_1": c_1,
+        "c_2": c_2,
+        "tau": tau,
+        "q_1": rho * c_1 / tau,
+        "q_2": rho * c_2 / tau,
+        "q_rho": c / tau,
+    }
+
+
+def _scatter_eta(
+    matches: EncodedMatches, d_eta_1: np.ndarray, d_eta_2: np.ndarray, d_rho: np.ndarray
+) -> np.ndarray:
+    """
+    Map per match derivatives with respect to (eta_1, eta_2, rho) back onto the parameter vector
+    """
+    n_teams = matches.n_teams
+    h, a = matches.home_idx, matches.away_idx
+    rho_and_home_adv = np.bincount(
+        matches.rho_param, d_rho, matches.n_params
+    ) + np.bincount(matches.home_adv_param, d_eta_1, matches.n_params)
+    return np.concatenate(
+        (
+            np.bincount(h, d_eta_1, n_teams) + np.bincount(a, d_eta_2, n_teams),
+            np.bincount(a, d_eta_1, n_teams) + np.bincount(h, d_eta_2, n_teams),
+            rho_and_home_adv[2 * n_teams :],
+        )
+    )
+
+
+@instrument(items=n_matches)
+def dc_gradient(
+    params: np.ndarray, matches: EncodedMatches, weights: np.ndarray = None
+) -> np.ndarray:
+    """
+    The analytic gradient of dc_log_likelihood with respect to every parameter
+    """
+    terms = _match_terms(params, matches)
+    if weights is None:
+        weights = np.ones(len(matches))
+    return _scatter_eta(
+        matches,
+        weights * (matches.home_goals - terms["lambda"] + terms["q_1"]),
+        weights * (matches.away_goals - terms["mu"] + terms["q_2"]),
+        weights * terms["q_rho"],
+    )
+
+
+def _local_hessian(terms: dict) -> dict:
+    """
+    The second derivatives of each match's log likelihood with respect to (eta_1, eta_2, rho)
+    """
+    q_1, q_2, q_rho, tau = terms["q_1"], terms["q_2"], terms["q_rho"], terms["tau"]
+    return {
+        (0, 0): q_1 - q_1**2 - terms["lambda"],
+        (1, 1): q_2 - q_2**2 - terms["mu"],
+        (0, 1): -terms["rho"] * terms["p_00"] / tau - q_1 * q_2,
+        (0, 2): terms["c_1"] / tau - q_1 * q_rho,
+        (1, 2): terms["c_2"] / tau - q_2 * q_rho,
+        (2, 2): -(q_rho**2),
+    }
+
+
+def _hessian_triplets(
+    params: np.ndarray, matches: EncodedMatches, weights: np.ndarray = None
+):
+    """
+    The Hessian of dc_log_likelihood as (rows, cols, values) triplets with duplicates,
+    which can be summed into either a dense or a sparse matrix
+    """
+    n_teams = matches.n_teams
+    n_matches = len(matches)
+    h, a = matches.home_idx, matches.away_idx
+    if weights is None:
+        weights = np.ones(n_matches)
+
+    local = _local_hessian(_match_terms(params, matches))
+    # the parameters each of eta_1, eta_2 and rho load on (all with coefficient one)
+    eta_params = [
+        [h, n_teams + a, matches.home_adv_param],
+        [a, n_teams + h],
+        [matches.rho_param],
+    ]
+
+    rows, cols, values = [], [], []
+    for (u, v), h_uv in local.items():
+        h_uv = weights * h_uv
+        pairs = [(u, v)] if u == v else [(u, v), (v, u)]
+        for s, t in pairs:
+            for row in eta_params[s]:
+                for col in eta_params[t]:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(h_uv)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+@instrument(items=n_matches)
+def dc_hessian(
+    params: np.ndarray, matches: EncodedMatches, weights: np.ndarray = None
+) -> np.ndarray:
+    """
+    The analytic Hessian of dc_log_likelihood as a dense matrix
+    """
+    n_params = len(params)
+    rows, cols, values = _hessian_triplets(params, matches, weights)
+    return np.bincount(rows * n_params + cols, values, n_params**2).reshape(
+        n_params, n_params
+    )
+
+
+@instrument(items=n_matches)
+def dc_hessian_sparse(
+    params: np.ndarray, matches: EncodedMatches, weights: np.ndarray = None
+) -> sparse.csr_matrix:
+    """
+    The analytic Hessian of dc_log_likelihood as a sparse matrix. Attack / defence pairs of teams
+    that never played each other are zero, so this stays small when fitting many teams at once
+    """
+    n_params = len(params)
+    rows, cols, values = _hessian_triplets(params, matches, weights)
+    # duplicate (row, col) entries are summed when converting to csr
+    return sparse.coo_matrix((values, (rows, cols)), shape=(n_params, n_params)).tocsr()
+
+
+@instrument(items=lambda result, params, vector, matches, *args: len(matches))
+def dc_hessp(
+    params: np.ndarray,
+    vector: np.ndarray,
+    matches: EncodedMatches,
+    weights: np.ndarray = None,
+) -> np.ndarray:
+    """
+    The product of the Hessian of dc_log_likelihood with a vector, without forming the Hessian
+    """
+    n_teams = matches.n_teams
+    h, a = matches.home_idx, matches.away_idx
+    if weights is None:
+        weights = np.ones(len(matches))
+
+    local = _local_hessian(_match_terms(params, matches))
+    # project the vector onto (eta_1, eta_2, rho) for every match
+    v_1 = vector[h] + vector[n_teams + a] + vector[matches.home_adv_param]
+    v_2 = vector[a] + vector[n_teams + h]
+    v_rho = vector[matches.rho_param]
+
+    return _scatter_eta(
+        matches,
+        weights * (local[(0, 0)] * v_1 + local[(0, 1)] * v_2 + local[(0, 2)] * v_rho),
+        weights * (local[(0, 1)] * v_1 + local[(1, 1)] * v_2 + local[(1, 2)] * v_rho),
+        weights * (local[(0, 2)] * v_1 + local[(1, 2)] * v_2 + local[(2, 2)] * v_rho),
+    )
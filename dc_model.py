@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+from poisson_tables import poisson_pmf_table
+
+
+def params_to_arrays(params_dict: dict):
+    """
+    Splits a parameter dictionary into the team names, attack and defence arrays, rho and home advantage
+    """
+    teams = [k[len("attack_") :] for k in params_dict if k.startswith("attack_")]
+    attack = np.array([params_dict["attack_" + team] for team in teams])
+    defence = np.array([params_dict["defence_" + team] for team in teams])
+    return teams, attack, defence, params_dict["rho"], params_dict["home_adv"]
+
+
+def team_indices(teams, team_names) -> np.ndarray:
+    """
+    Looks up the position of every team name in teams, raising a KeyError for teams that aren't there
+    """
+    idx = pd.Index(teams).get_indexer(team_names)
+    if (idx < 0).any():
+        raise KeyError(list(pd.Index(team_names)[idx < 0]))
+    return idx
+
+
+def score_tensor(expected_home, expected_away, rho, max_goals=10) -> np.ndarray:
+    """
+    The Dixon-Coles score probabilities for many matches at once from their expected goals,
+    rho can be a single value or one per match.
+    Returns an (n_matches, max_goals + 1, max_goals + 1) array indexed by [match, home goals, away goals]
+    """
+    expected_home = np.asarray(expected_home, dtype=np.float64)
+    expected_away = np.asarray(expected_away, dtype=np.float64)
+
+    # one (n_matches, max_goals + 1) table of poisson probabilities per side
+    home_pmf = poisson_pmf_table(expected_home, max_goals)
+    away_pmf = poisson_pmf_table(expected_away, max_goals)
+    output = home_pmf[:, :, None] * away_pmf[:, None, :]
+
+    output[:, 0, 0] *= 1 - expected_home * expected_away * rho
+    output[:, 0, 1] *= 1 + expected_home * rho
+    output[:, 1, 0] *= 1 + expected_away * rho
+    output[:, 1, 1] *= 1 - rho
+    return output
+
+
+def stacked_score_tensor(models: list, home_teams, away_teams, max_goals=10):
+    """
+    The score probabilities of every fixture under every model from a single score_tensor call,
+    as an (n_models, n_fixtures, max_goals + 1, max_goals + 1) array
+    """
+    expected_home, expected_away, rho = [], [], []
+    for model in models:
+        home_idx, away_idx = model.encode(home_teams), model.encode(away_teams)
+        model_home, model_away = model.expected_goals(home_idx, away_idx)
+        expected_home.append(model_home)
+        expected_away.append(model_away)
+        rho.append(np.full(len(home_idx), model.rho))
+
+    tensor = score_tensor(
+        np.concatenate(expected_home),
+        np.concatenate(expected_away),
+        np.concatenate(rho),
+        max_goals=max_goals,
+    )
+    return tensor.reshape(len(models), -1, max_goals + 1, max_goals + 1)
+
+
+class DixonColesModel:
+    """
+    A fitted Dixon-Coles model held as contiguous arrays rather than a string keyed dictionary.
+    Teams are looked up once with encode and every prediction after that works on integer indices
+    """
+
+    __slots__ = ("teams", "team_index", "attack", "defence", "rho", "home_adv")
+
+    def __init__(self, teams, attack, defence, rho: float, home_adv: float):
+        self.teams = np.asarray(teams, dtype=str)
+        self.team_index = {team: i for i, team in enumerate(self.teams)}
+        self.attack = np.ascontiguousarray(attack, dtype=np.float64)
+        self.defence = np.ascontiguousarray(defence, dtype=np.float64)
+        self.rho = float(rho)
+        self.home_adv = float(home_adv)
+
+    @classmethod
+    def from_params_dict(cls, params_dict: dict) -> "DixonColesModel":
+        return cls(*params_to_arrays(params_dict))
+
+    def to_params_dict(self) -> dict:
+        """
+        The attack_ / defence_ / rho / home_adv dictionary returned by solve_parameters_decay
+        """
+        params = {"attack_" + team: a for team, a in zip(self.teams, self.attack)}
+        params.update(
+            {"defence_" + team: d for team, d in zip(self.teams, self.defence)}
+        )
+        params.update({"rho": self.rho, "home_adv": self.home_adv})
+        return params
+
+    def __len__(self) -> int:
+        return len(self.teams)
+
+    def __repr__(self) -> str:
+        return f"DixonColesModel({len(self)} teams, rho={self.rho:.4f}, home_adv={self.home_adv:.4f})"
+
+    def encode(self, team_names) -> np.ndarray:
+        """
+        The index of every team name, raising a KeyError for teams the model doesn't know
+        """
+        # building a pandas Index costs far more than the lookup for a fixture or two
+        if len(team_names) <= 16:
+            try:
+                return np.array(
+                    [self.team_index[team] for team in team_names], dtype=np.int64
+                )
+            except KeyError:
+                pass
+        return team_indices(self.teams, team_names)
+
+    def expected_goals(self, home_idx, away_idx):
+        """
+        The expected home and away goals for every (home_idx, away_idx) fixture
+        """
+        return (
+            np.exp(self.attack[home_idx] + self.defence[away_idx] + self.home_adv),
+            np.exp(self.defence[home_idx] + self.attack[away_idx]),
+        )
+
+    def score_tensor(self, home_idx, away_idx, max_goals=10) -> np.ndarray:
+        """
+        The (n_fixtures, max_goals + 1, max_goals + 1) score probabilities for every fixture
+        """
+        expected_home, expected_away = self.expected_goals(home_idx, away_idx)
+        return score_tensor(expected_home, expected_away, self.rho, max_goals=max_goals)
+
+    def save(self, path) -> None:
+        """
+        Saves the model losslessly to a .npz file
+        """
+        np.savez(
+            path,
+            teams=self.teams,
+            attack=self.attack,
+            defence=self.defence,
+            rho=self.rho,
+            home_adv=self.home_adv,
+        )
+
+    @classmethod
+    def load(cls, path) -> "DixonColesModel":
+        with np.load(path) as data:
+            return cls(
+                data["teams"],
+                data["attack"],
+                data["defence"],
+                data["rho"][()],
+                data["home_adv"][()],
+            )
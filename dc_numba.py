@@ -0,0 +1,143 @@
+import numpy as np
+
+from dc_likelihood import EncodedMatches
+from profiling import instrument
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ("numpy", "numba")
+
+
+def _neg_log_like_and_grad(
+    params,
+    n_teams,
+    home_idx,
+    away_idx,
+    home_goals,
+    away_goals,
+    log_factorial,
+    rho_param,
+    home_adv_param,
+    weights,
+    grad,
+):
+    """
+    The negative weighted Dixon-Coles log likelihood, writing its gradient into grad.
+    A single loop over the matches so there are no per match temporary arrays
+    """
+    grad[:] = 0.0
+    total = 0.0
+    for i in range(len(home_idx)):
+        h = home_idx[i]
+        a = away_idx[i]
+        x = home_goals[i]
+        y = away_goals[i]
+        w = weights[i]
+        rho = params[rho_param[i]]
+        gamma = params[home_adv_param[i]]
+
+        log_lambda = params[h] + params[n_teams + a] + gamma
+        log_mu = params[a] + params[n_teams + h]
+        lambda_x = np.exp(log_lambda)
+        mu_y = np.exp(log_mu)
+
+        # c is d(tau)/d(rho), c_1 and c_2 are its derivatives with respect to log(lambda) and log(mu)
+        c_1 = 0.0
+        c_2 = 0.0
+        c = 0.0
+        # tau is 1 outside the low scoring cells so its log is only needed for those
+        log_tau = 0.0
+        if x == 0 and y == 0:
+            c = -lambda_x * mu_y
+            c_1 = c
+            c_2 = c
+        elif x == 0 and y == 1:
+            c = lambda_x
+            c_1 = c
+        elif x == 1 and y == 0:
+            c = mu_y
+            c_2 = c
+        elif x == 1 and y == 1:
+            c = -1.0
+        tau = 1.0 + rho * c
+        if c != 0.0:
+            log_tau = np.log(tau)
+
+        total += w * (
+            log_tau + x * log_lambda - lambda_x + y * log_mu - mu_y - log_factorial[i]
+        )
+
+        d_eta_1 = w * (x - lambda_x + rho * c_1 / tau)
+        d_eta_2 = w * (y - mu_y + rho * c_2 / tau)
+        grad[h] -= d_eta_1
+        grad[n_teams + a] -= d_eta_1
+        grad[home_adv_param[i]] -= d_eta_1
+        grad[a] -= d_eta_2
+        grad[n_teams + h] -= d_eta_2
+        grad[rho_param[i]] -= w * c / tau
+    return -total
+
+
+if NUMBA_AVAILABLE:
+    _neg_log_like_and_grad = njit(cache=True)(_neg_log_like_and_grad)
+
+
+class NumbaObjective:
+    """
+    The objective and gradient for minimize(..., jac=True) backed by the compiled kernel.
+    The match arrays are made contiguous and the gradient buffer is allocated once up front,
+    the kernel itself doesn't allocate anything per call
+    """
+
+    def __init__(self, matches: EncodedMatches, weights: np.ndarray = None):
+        if not NUMBA_AVAILABLE:
+            raise ImportError("numba isn't installed")
+        self.n_teams = matches.n_teams
+        self.home_idx = np.ascontiguousarray(matches.home_idx, dtype=np.int64)
+        self.away_idx = np.ascontiguousarray(matches.away_idx, dtype=np.int64)
+        self.home_goals = np.ascontiguousarray(matches.home_goals, dtype=np.int64)
+        self.away_goals = np.ascontiguousarray(matches.away_goals, dtype=np.int64)
+        self.log_factorial = np.ascontiguousarray(
+            matches.log_factorial, dtype=np.float64
+        )
+        self.rho_param = np.ascontiguousarray(matches.rho_param, dtype=np.int64)
+        self.home_adv_param = np.ascontiguousarray(
+            matches.home_adv_param, dtype=np.int64
+        )
+        if weights is None:
+            weights = np.ones(len(matches))
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.grad = np.zeros(matches.n_params)
+
+    @instrument(
+        "NumbaObjective.value_and_grad",
+        items=lambda result, self, params: len(self.weights),
+    )
+    def value_and_grad(self, params: np.ndarray):
+        """
+        The negative log likelihood, with its gradient left in self.grad
+        """
+        value = _neg_log_like_and_grad(
+            np.ascontiguousarray(params, dtype=np.float64),
+            self.n_teams,
+            self.home_idx,
+            self.away_idx,
+            self.home_goals,
+            self.away_goals,
+            self.log_factorial,
+            self.rho_param,
+            self.home_adv_param,
+            self.weights,
+            self.grad,
+        )
+        return value, self.grad
+
+    def __call__(self, params: np.ndarray):
+        value, grad = self.value_and_grad(params)
+        # scipy keeps hold of the gradient between iterations so it gets its own copy
+        return value, grad.copy()
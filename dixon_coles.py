@@ -1,10 +1,33 @@
+import warnings
+
 import numpy as np
 from scipy.optimize import minimize
-from scipy.stats import poisson
 
 from bettools import calculate_ev_from_odds, kelly_criterion
+from dc_model import DixonColesModel, score_tensor
+from markets import outcome_probs
+from poisson_tables import poisson_log_pmf
+from profiling import instrument, n_rows
+from dc_numba import BACKENDS, NUMBA_AVAILABLE, NumbaObjective
+from dc_likelihood import (
+    dc_gradient,
+    dc_hessian,
+    dc_log_likelihood,
+    encode_matches,
+    match_weights,
+)
 import pandas as pd
 
+# scipy minimize methods that make use of second derivatives
+HESSIAN_METHODS = (
+    "Newton-CG",
+    "dogleg",
+    "trust-ncg",
+    "trust-krylov",
+    "trust-exact",
+    "trust-constr",
+)
+
 
 def rho_correction(x, y, lambda_x, mu_y, rho):
     if x == 0 and y == 0:
@@ -19,12 +42,80 @@ def rho_correction(x, y, lambda_x, mu_y, rho):
         return 1.0
 
 
+def add_derivatives(kwargs: dict, matches, weights=None) -> dict:
+    """
+    Passes the analytic gradient of the objective to minimize, plus the Hessian for the methods that use it.
+    Anything already in kwargs (eg a user supplied jac or hessp) is left alone
+    """
+    kwargs.setdefault("jac", lambda params: -dc_gradient(params, matches, weights))
+    if kwargs.get("method") in HESSIAN_METHODS and "hessp" not in kwargs:
+        kwargs.setdefault("hess", lambda params: -dc_hessian(params, matches, weights))
+    return kwargs
+
+
+def attack_constraint(n_teams: int, n_params: int = None) -> list[dict]:
+    """
+    The identifiability constraint that the attack strengths of the n_teams teams average one.
+    This is the default for every solver, it used to always be the first 20 parameters whatever the league size
+    """
+    if n_params is None:
+        n_params = 2 * n_teams + 2
+    jac = np.zeros(n_params)
+    jac[:n_teams] = 1
+    return [
+        {
+            "type": "eq",
+            "fun": lambda x: np.sum(x[:n_teams]) - n_teams,
+            "jac": lambda x: jac,
+        }
+    ]
+
+
+def params_to_dict(teams, values) -> dict:
+    """
+    Converts the optimiser's parameter vector into the attack_ / defence_ / rho / home_adv dictionary
+    """
+    return dict(
+        zip(
+            ["attack_" + team for team in teams]
+            + ["defence_" + team for team in teams]
+            + ["rho", "home_adv"],
+            values,
+        )
+    )
+
+
+def warm_start_params(params: dict, teams, n_weakest: int = 3) -> np.ndarray:
+    """
+    Builds the initial parameter vector for the given teams from a previous fit's parameters.
+    Teams that weren't in the previous fit (eg newly promoted) start from the average of the
+    n_weakest attacks and defences, teams that have dropped out are discarded
+    """
+    attack = {
+        k[len("attack_") :]: v for k, v in params.items() if k.startswith("attack_")
+    }
+    defence = {
+        k[len("defence_") :]: v for k, v in params.items() if k.startswith("defence_")
+    }
+    # a higher defence parameter means conceding more goals
+    new_attack = np.mean(np.sort(list(attack.values()))[:n_weakest])
+    new_defence = np.mean(np.sort(list(defence.values()))[-n_weakest:])
+
+    return np.concatenate(
+        (
+            [attack.get(team, new_attack) for team in teams],
+            [defence.get(team, new_defence) for team in teams],
+            [params["rho"], params["home_adv"]],
+        )
+    )
+
+
 def dc_log_like(x, y, alpha_x, beta_x, alpha_y, beta_y, rho, gamma):
     lambda_x, mu_y = np.exp(alpha_x + beta_y + gamma), np.exp(alpha_y + beta_x)
     return (
         np.log(rho_correction(x, y, lambda_x, mu_y, rho))
-        + np.log(poisson.pmf(x, lambda_x))
-        + np.log(poisson.pmf(y, mu_y))
+        + poisson_log_pmf(x, lambda_x)
+        + poisson_log_pmf(y, mu_y)
     )
 
 
@@ -32,8 +123,8 @@ def solve_parameters(
     dataset,
     debug=False,
     init_vals=None,
-    options={"disp": True, "maxiter": 100},
-    constraints=[{"type": "eq", "fun": lambda x: sum(x[:20]) - 20}],
+    options={"disp": False, "maxiter": 100},
+    constraints=None,
     **kwargs
 ):
     teams = np.sort(dataset["HomeTeam"].unique())
@@ -51,33 +142,18 @@ def solve_parameters(
                 np.array([0, 1.0]),  # rho (score correction), gamma (home advantage)
             )
         )
+    elif isinstance(init_vals, dict):
+        # warm start from a previous fit, which may have had different teams
+        init_vals = warm_start_params(init_vals, teams)
+    if constraints is None:
+        constraints = attack_constraint(n_teams)
 
-    def dc_log_like(x, y, alpha_x, beta_x, alpha_y, beta_y, rho, gamma):
-        lambda_x, mu_y = np.exp(alpha_x + beta_y + gamma), np.exp(alpha_y + beta_x)
-        return (
-            np.log(rho_correction(x, y, lambda_x, mu_y, rho))
-            + np.log(poisson.pmf(x, lambda_x))
-            + np.log(poisson.pmf(y, mu_y))
-        )
+    matches = encode_matches(dataset, teams=teams)
 
     def estimate_paramters(params):
-        score_coefs = dict(zip(teams, params[:n_teams]))
-        defend_coefs = dict(zip(teams, params[n_teams : (2 * n_teams)]))
-        rho, gamma = params[-2:]
-        log_like = [
-            dc_log_like(
-                row.FTHG,
-                row.FTAG,
-                score_coefs[row.HomeTeam],
-                defend_coefs[row.HomeTeam],
-                score_coefs[row.AwayTeam],
-                defend_coefs[row.AwayTeam],
-                rho,
-                gamma,
-            )
-            for row in dataset.itertuples()
-        ]
-        return -sum(log_like)
+        return -dc_log_likelihood(params, matches)
+
+    kwargs = add_derivatives(kwargs, matches)
 
     opt_output = minimize(
         estimate_paramters,
@@ -90,14 +166,7 @@ def solve_parameters(
         # sort of hacky way to investigate the output of the optimisation process
         return opt_output
     else:
-        return dict(
-            zip(
-                ["attack_" + team for team in teams]
-                + ["defence_" + team for team in teams]
-                + ["rho", "home_adv"],
-                opt_output.x,
-            )
-        )
+        return params_to_dict(teams, opt_output.x)
 
 
 def calc_means(param_dict, homeTeam, awayTeam):
@@ -111,154 +180,358 @@ def calc_means(param_dict, homeTeam, awayTeam):
     ]
 
 
+def dixon_coles_score_tensor(
+    attack, defence, rho, home_adv, home_idx, away_idx, max_goals=10
+) -> np.ndarray:
+    """
+    The score probabilities for every (home_idx, away_idx) fixture from the attack and defence arrays
+    """
+    expected_home = np.exp(attack[home_idx] + defence[away_idx] + home_adv)
+    expected_away = np.exp(defence[home_idx] + attack[away_idx])
+    return score_tensor(expected_home, expected_away, rho, max_goals=max_goals)
+
+
+@instrument(items=n_rows)
+def dixon_coles_simulate_matches(params, home_teams, away_teams, max_goals=10):
+    """
+    The score probabilities for a list of fixtures from either a DixonColesModel or a parameter dict,
+    which is converted to arrays only once
+    """
+    if not isinstance(params, DixonColesModel):
+        params = DixonColesModel.from_params_dict(params)
+    return params.score_tensor(
+        params.encode(home_teams), params.encode(away_teams), max_goals=max_goals
+    )
+
+
 def dixon_coles_simulate_match(params_dict, homeTeam, awayTeam, max_goals=10):
+    if isinstance(params_dict, DixonColesModel):
+        return dixon_coles_simulate_matches(
+            params_dict, [homeTeam], [awayTeam], max_goals=max_goals
+        )[0]
     team_avgs = calc_means(params_dict, homeTeam, awayTeam)
-    team_pred = [
-        [poisson.pmf(i, team_avg) for i in range(0, max_goals + 1)]
-        for team_avg in team_avgs
-    ]
-    output_matrix = np.outer(np.array(team_pred[0]), np.array(team_pred[1]))
-    correction_matrix = np.array(
-        [
-            [
-                rho_correction(
-                    home_goals,
-                    away_goals,
-                    team_avgs[0],
-                    team_avgs[1],
-                    params_dict["rho"],
-                )
-                for away_goals in range(2)
-            ]
-            for home_goals in range(2)
-        ]
-    )
-    output_matrix[:2, :2] = output_matrix[:2, :2] * correction_matrix
-    return output_matrix
+    return score_tensor(
+        [team_avgs[0]], [team_avgs[1]], params_dict["rho"], max_goals=max_goals
+    )[0]
 
 
 def dc_log_like_decay(x, y, alpha_x, beta_x, alpha_y, beta_y, rho, gamma, t, xi=0):
     lambda_x, mu_y = np.exp(alpha_x + beta_y + gamma), np.exp(alpha_y + beta_x)
     return np.exp(-xi * t) * (
         np.log(rho_correction(x, y, lambda_x, mu_y, rho))
-        + np.log(poisson.pmf(x, lambda_x))
-        + np.log(poisson.pmf(y, mu_y))
+        + poisson_log_pmf(x, lambda_x)
+        + poisson_log_pmf(y, mu_y)
+    )
+
+
+def random_init_vals(matches) -> np.ndarray:
+    """
+    A random starting point for the parameters of the encoded matches
+    """
+    return np.concatenate(
+        (
+            np.random.uniform(0, 1, (matches.n_teams)),  # attack strength
+            np.random.uniform(0, -1, (matches.n_teams)),  # defence strength
+            np.zeros(matches.n_rho),  # rho (score correction)
+            np.ones(matches.n_home_adv),  # gamma (home advantage)
+        )
+    )
+
+
+@instrument()
+def fit_encoded(
+    matches,
+    weights=None,
+    init_vals=None,
+    options={"disp": False, "maxiter": 100},
+    constraints=None,
+    backend="numpy",
+    **kwargs
+):
+    """
+    Fits the model to matches that have already been encoded, returning scipy's OptimizeResult.
+    This lets callers that fit the same matches many times (eg with different xi) encode them once.
+    backend="numba" evaluates the objective and gradient together with the compiled kernel in dc_numba.py,
+    falling back to numpy if numba isn't installed
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, not {backend}")
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        warnings.warn("numba isn't installed, using the numpy backend")
+        backend = "numpy"
+    if init_vals is None:
+        init_vals = random_init_vals(matches)
+    if constraints is None:
+        constraints = attack_constraint(matches.n_teams, matches.n_params)
+
+    if backend == "numba" and "jac" not in kwargs:
+        # the objective returns (value, gradient) so the gradient comes from the same pass
+        estimate_paramters = NumbaObjective(matches, weights)
+        kwargs["jac"] = True
+    else:
+
+        def estimate_paramters(params):
+            return -dc_log_likelihood(params, matches, weights)
+
+    kwargs = add_derivatives(kwargs, matches, weights)
+
+    return minimize(
+        estimate_paramters,
+        init_vals,
+        options=options,
+        constraints=constraints,
+        **kwargs
     )
 
 
+def _group_mean(values: np.ndarray, team_group=None):
+    """
+    The mean of values over all the teams, or over each team's group if team_group is given
+    """
+    if team_group is None:
+        return np.mean(values)
+    return (np.bincount(team_group, values) / np.bincount(team_group))[team_group]
+
+
+def centre_attack(params: np.ndarray, n_teams: int, team_group=None) -> np.ndarray:
+    """
+    Shifts the attack strengths so they average one (within each group of teams if team_group is given),
+    which is how the unconstrained solver satisfies the identifiability constraint
+    """
+    params = params.copy()
+    params[:n_teams] -= _group_mean(params[:n_teams], team_group) - 1
+    return params
+
+
+@instrument()
+def fit_encoded_centred(
+    matches,
+    weights=None,
+    init_vals=None,
+    options={"maxiter": 1000},
+    rho_bounds=(-0.2, 0.2),
+    team_group=None,
+    backend="numpy",
+    **kwargs
+):
+    """
+    Fits the encoded matches with L-BFGS-B instead of SLSQP by removing the constraint:
+    the optimiser works on free attack values which are centred to average one before every evaluation.
+    Only rho is bounded and passing constraints is an error. The OptimizeResult's x is mapped back so it's
+    laid out exactly like fit_encoded's
+    """
+    if kwargs.get("constraints") is not None:
+        raise ValueError(
+            "L-BFGS-B can't enforce constraints, the attack strengths are centred instead"
+        )
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        warnings.warn("numba isn't installed, using the numpy backend")
+        backend = "numpy"
+    if init_vals is None:
+        init_vals = random_init_vals(matches)
+    n_teams = matches.n_teams
+    if team_group is not None:
+        team_group = np.asarray(team_group)
+
+    if backend == "numba":
+        numba_objective = NumbaObjective(matches, weights)
+
+    def estimate_paramters(free_params):
+        params = centre_attack(free_params, n_teams, team_group)
+        if backend == "numba":
+            value, grad = numba_objective(params)
+        else:
+            value = -dc_log_likelihood(params, matches, weights)
+            grad = -dc_gradient(params, matches, weights)
+        # the chain rule through the centring removes the (group) mean of the attack gradient
+        grad[:n_teams] -= _group_mean(grad[:n_teams], team_group)
+        return value, grad
+
+    bounds = [(None, None)] * matches.n_params
+    for rho_param in range(2 * n_teams, 2 * n_teams + matches.n_rho):
+        bounds[rho_param] = rho_bounds
+
+    opt_output = minimize(
+        estimate_paramters,
+        init_vals,
+        jac=True,
+        method="L-BFGS-B",
+        bounds=bounds,
+        options=options,
+        **kwargs
+    )
+    opt_output.x = centre_attack(opt_output.x, n_teams, team_group)
+    return opt_output
+
+
+@instrument()
 def solve_parameters_decay(
     dataset: pd.DataFrame,
     xi=0.001,
     debug=False,
     init_vals=None,
-    options={"disp": True, "maxiter": 100},
-    constraints=[{"type": "eq", "fun": lambda x: sum(x[:20]) - 20}],
+    options={"disp": False, "maxiter": 100},
+    constraints=None,
+    backend="numpy",
+    solver="slsqp",
     **kwargs
 ):
-    print("starting to solve parameters")
-
+    """
+    Fits the time weighted model to dataset. backend is "numpy" or "numba", see fit_encoded.
+    solver="lbfgsb" drops the constraint and uses L-BFGS-B on centred attack values (see fit_encoded_centred),
+    which is much cheaper than SLSQP for larger leagues
+    """
     # Define the teams
     teams = np.sort(dataset["HomeTeam"].unique())
     # check for no weirdness in dataset
     away_teams = np.sort(dataset["AwayTeam"].unique())
     if not np.array_equal(teams, away_teams):
         raise ValueError("something not right")
-    n_teams = len(teams)
+
+    matches = encode_matches(dataset, teams=teams)
+    weights = match_weights(matches, xi=xi)
     if init_vals is None:
         # random initialisation of model parameters
-        init_vals = np.concatenate(
-            (
-                np.random.uniform(0, 1, (n_teams)),  # attack strength
-                np.random.uniform(0, -1, (n_teams)),  # defence strength
-                np.array([0, 1.0]),  # rho (score correction), gamma (home advantage)
+        init_vals = random_init_vals(matches)
+    elif isinstance(init_vals, dict):
+        # warm start from a previous fit, which may have had different teams
+        init_vals = warm_start_params(init_vals, teams)
+
+    if solver == "lbfgsb":
+        if constraints is not None:
+            raise ValueError(
+                "the lbfgsb solver can't enforce constraints, use solver='slsqp'"
             )
+        opt_output = fit_encoded_centred(
+            matches,
+            weights,
+            init_vals=init_vals,
+            options=options,
+            backend=backend,
+            **kwargs
         )
-
-    def dc_log_like_decay(x, y, alpha_x, beta_x, alpha_y, beta_y, rho, gamma, t, xi=xi):
-        lambda_x, mu_y = np.exp(alpha_x + beta_y + gamma), np.exp(alpha_y + beta_x)
-        return np.exp(-xi * t) * (
-            np.log(rho_correction(x, y, lambda_x, mu_y, rho))
-            + np.log(poisson.pmf(x, lambda_x))
-            + np.log(poisson.pmf(y, mu_y))
+    elif solver == "slsqp":
+        opt_output = fit_encoded(
+            matches,
+            weights,
+            init_vals=init_vals,
+            options=options,
+            constraints=constraints,
+            backend=backend,
+            **kwargs
         )
-
-    def estimate_paramters(params):
-        score_coefs = dict(zip(teams, params[:n_teams]))
-        defend_coefs = dict(zip(teams, params[n_teams : (2 * n_teams)]))
-        rho, gamma = params[-2:]
-        log_like = [
-            dc_log_like_decay(
-                row.FTHG,
-                row.FTAG,
-                score_coefs[row.HomeTeam],
-                defend_coefs[row.HomeTeam],
-                score_coefs[row.AwayTeam],
-                defend_coefs[row.AwayTeam],
-                rho,
-                gamma,
-                row.time_diff,
-                xi=xi,
-            )
-            for row in dataset.itertuples()
-        ]
-        return -sum(log_like)
-
-    opt_output = minimize(
-        estimate_paramters, init_vals, options=options, constraints=constraints
-    )
+    else:
+        raise ValueError(f"solver must be slsqp or lbfgsb, not {solver}")
     if debug:
         # sort of hacky way to investigate the output of the optimisation process
         return opt_output
     else:
-        return dict(
-            zip(
-                ["attack_" + team for team in teams]
-                + ["defence_" + team for team in teams]
-                + ["rho", "home_adv"],
-                opt_output.x,
-            )
+        return params_to_dict(teams, opt_output.x)
+
+
+def solve_parameters_rolling(
+    datasets: list[pd.DataFrame], xi=0.001, init_vals=None, compare_cold=False, **kwargs
+):
+    """
+    Fits solve_parameters_decay to a sequence of (typically overlapping) training windows in order,
+    seeding each fit with the previous window's solution rather than a random start.
+    Returns the list of parameter dicts and a dataframe of the iterations each fit took, if compare_cold
+    is set every window is also fitted from a random start to show the iterations saved
+    """
+    params_list = []
+    summary = []
+    previous_params = init_vals
+    for window, dataset in enumerate(datasets):
+        teams = np.sort(dataset["HomeTeam"].unique())
+        opt_output = solve_parameters_decay(
+            dataset, xi=xi, debug=True, init_vals=previous_params, **kwargs
         )
+        params = params_to_dict(teams, opt_output.x)
+
+        window_summary = {
+            "window": window,
+            "n_matches": len(dataset),
+            "n_teams": len(teams),
+            "warm_start": isinstance(previous_params, dict),
+            "new_teams": 0,
+            "dropped_teams": 0,
+            "nit": opt_output.nit,
+            "nfev": opt_output.nfev,
+        }
+        if isinstance(previous_params, dict):
+            previous_teams = {
+                k[len("attack_") :] for k in previous_params if k.startswith("attack_")
+            }
+            window_summary["new_teams"] = len(set(teams) - previous_teams)
+            window_summary["dropped_teams"] = len(previous_teams - set(teams))
+        if compare_cold:
+            cold_output = solve_parameters_decay(dataset, xi=xi, debug=True, **kwargs)
+            window_summary["cold_nit"] = cold_output.nit
+            window_summary["cold_nfev"] = cold_output.nfev
+
+        params_list.append(params)
+        summary.append(window_summary)
+        previous_params = params
+
+    summary = pd.DataFrame(summary)
+    if compare_cold:
+        summary["iterations_saved"] = summary["cold_nit"] - summary["nit"]
+        print(
+            f"warm starts took {summary['nit'].sum()} iterations against "
+            f"{summary['cold_nit'].sum()} from cold, saving {summary['iterations_saved'].sum()}"
+        )
+    return params_list, summary
 
 
 def get_1x2_probs(match_score_matrix):
+    probs_1x2 = outcome_probs(np.asarray(match_score_matrix)[None])
     return dict(
-        {
-            "H": np.sum(np.tril(match_score_matrix, -1)),
-            "A": np.sum(np.triu(match_score_matrix, 1)),
-            "D": np.sum(np.diag(match_score_matrix)),
-        }
+        {"H": probs_1x2["H"][0], "A": probs_1x2["A"][0], "D": probs_1x2["D"][0]}
     )
 
 
-def build_temp_model(dataset, time_diff, xi=0.000, init_params=None):
+def split_temp_model(dataset, time_diff):
+    """
+    The matches played before time_diff days ago to train on (with time_diff measured from then)
+    and the three days of matches after it to test on
+    """
     test_dataset = dataset[
         (
             (dataset["time_diff"] <= time_diff)
             & (dataset["time_diff"] >= (time_diff - 2))
         )
     ]
-    if len(test_dataset) == 0:
-        return 0
     train_dataset = dataset[dataset["time_diff"] > time_diff]
     train_dataset["time_diff"] = train_dataset["time_diff"] - time_diff
-    params = solve_parameters_decay(train_dataset, xi=xi, init_vals=init_params)
-    predictive_score = sum(
-        [
-            np.log(
-                get_1x2_probs(
-                    dixon_coles_simulate_match(params, row.HomeTeam, row.AwayTeam)
-                )[row.FTR]
-            )
-            for row in test_dataset.itertuples()
-        ]
+    return train_dataset, test_dataset
+
+
+def predictive_score(params, test_dataset) -> float:
+    """
+    The log probability the model gave to the actual results (FTR) of the test matches
+    """
+    score_matrices = dixon_coles_simulate_matches(
+        params, test_dataset["HomeTeam"], test_dataset["AwayTeam"]
     )
-    return predictive_score
+    probs_1x2 = outcome_probs(score_matrices)
+    return sum(
+        [np.log(probs_1x2[result][i]) for i, result in enumerate(test_dataset["FTR"])]
+    )
+
+
+def build_temp_model(dataset, time_diff, xi=0.000, init_params=None):
+    train_dataset, test_dataset = split_temp_model(dataset, time_diff)
+    if len(test_dataset) == 0:
+        return 0
+    params = solve_parameters_decay(train_dataset, xi=xi, init_vals=init_params)
+    return predictive_score(params, test_dataset)
 
 
-def get_total_score_xi(xi):
-    xi_result = [build_temp_model(dc_df, day, xi=xi) for day in range(99, -1, -3)]
-    with open("find_xi_1season_{}.txt".format(str(xi)[2:]), "wb") as thefile:
-        pickle.dump(xi_result, thefile)
+def get_total_score_xi(dataset, xi, days=range(99, -1, -3)):
+    """
+    The predictive score of xi on each block of days, see xi_tuning.py to search over many xi values
+    """
+    return [build_temp_model(dataset, day, xi=xi) for day in days]
 
 
 def make_betting_prediction(
@@ -298,3 +571,48 @@ def make_betting_prediction(
         )
         bet_selection = "Draw"
     return bet_selection, bet_amount
+
+
+# the 1x2 outcomes in the order the vectorised predictions use
+SELECTIONS = np.array(["Home", "Draw", "Away"])
+
+
+def make_betting_predictions(
+    probs: dict,
+    home_odds,
+    draw_odds,
+    away_odds,
+    bankroll=100,
+    kelly_fraction=0.05,
+) -> pd.DataFrame:
+    """
+    make_betting_prediction for many fixtures at once from their H / D / A probability arrays.
+    Returns the probabilities, EVs, the selection with the highest EV and its Kelly stake for every fixture,
+    with ties going to away, then draw, then home like make_betting_prediction
+    """
+    probabilities = np.column_stack([probs["H"], probs["D"], probs["A"]])
+    odds = np.column_stack([home_odds, draw_odds, away_odds]).astype(np.float64)
+    evs = calculate_ev_from_odds(odds, probabilities)
+
+    is_max = evs == evs.max(axis=1, keepdims=True)
+    choice = np.where(is_max[:, 2], 2, np.where(is_max[:, 1], 1, 0))
+    rows = np.arange(len(choice))
+    stake = kelly_criterion(
+        probabilities[rows, choice],
+        odds[rows, choice],
+        bankroll,
+        kelly_fraction=kelly_fraction,
+    )
+
+    return pd.DataFrame(
+        {
+            "prob_H": probabilities[:, 0],
+            "prob_D": probabilities[:, 1],
+            "prob_A": probabilities[:, 2],
+            "ev_H": evs[:, 0],
+            "ev_D": evs[:, 1],
+            "ev_A": evs[:, 2],
+            "selection": SELECTIONS[choice],
+            "stake": stake,
+        }
+    )
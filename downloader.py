@@ -0,0 +1,93 @@
+import itertools
+import threading
+import time
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import pandas as pd
+
+from data_cache import fetch_season_csv, parse_season_csv
+
+# HTTP statuses worth trying again, anything else (eg a 404 for a season that doesn't exist) fails straight away
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to each host so there are at most requests_per_second per host,
+    shared between all the threads using it
+    """
+
+    def __init__(self, requests_per_second: float = 4.0):
+        self.min_interval = 1.0 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_with_retry(
+    season,
+    league: str,
+    retries: int = 3,
+    backoff: float = 0.5,
+    limiter: HostRateLimiter = None,
+    **cache_kwargs,
+) -> pd.DataFrame:
+    """
+    Fetches and decodes one season / league, retrying transient failures with exponential backoff
+    """
+    for attempt in range(retries + 1):
+        try:
+            content = fetch_season_csv(season, league, limiter=limiter, **cache_kwargs)
+            return parse_season_csv(content)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUSES or attempt == retries:
+                raise
+            error = e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            if attempt == retries:
+                raise
+            error = e
+        wait = backoff * 2**attempt
+        print(f"fetching {season}/{league} failed ({error}), retrying in {wait}s")
+        time.sleep(wait)
+
+
+def fetch_many(
+    season_list: list,
+    league_list: list[str],
+    max_workers: int = 8,
+    requests_per_second: float = 4.0,
+    retries: int = 3,
+    backoff: float = 0.5,
+    **cache_kwargs,
+) -> list[pd.DataFrame]:
+    """
+    Fetches every season / league combination on a bounded thread pool.
+    The frames come back in the same order as looping over seasons then leagues, whatever order they finish in
+    """
+    limiter = HostRateLimiter(requests_per_second)
+    combinations = list(itertools.product(season_list, league_list))
+
+    def fetch(combination):
+        season, league = combination
+        return fetch_with_retry(
+            season,
+            league,
+            retries=retries,
+            backoff=backoff,
+            limiter=limiter,
+            **cache_kwargs,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, combinations))
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from dc_model import DixonColesModel, stacked_score_tensor
+from dixon_coles import SELECTIONS, make_betting_predictions
+from markets import outcome_probs
+from profiling import instrument, n_rows
+
+POOLING_METHODS = ("linear", "log")
+
+
+def as_models(params_list: list) -> list[DixonColesModel]:
+    """
+    Converts any parameter dictionaries to array backed models, models are passed through
+    """
+    return [
+        DixonColesModel.from_params_dict(params) if isinstance(params, dict) else params
+        for params in params_list
+    ]
+
+
+def model_probs(models: list, home_teams, away_teams, max_goals=10) -> np.ndarray:
+    """
+    The H / D / A probabilities of every fixture under every model, as an (n_models, n_fixtures, 3) array
+    """
+    tensor = stacked_score_tensor(models, home_teams, away_teams, max_goals)
+    n_models, n_fixtures = tensor.shape[:2]
+    probs_1x2 = outcome_probs(tensor.reshape(n_models * n_fixtures, *tensor.shape[2:]))
+    return np.stack([probs_1x2["H"], probs_1x2["D"], probs_1x2["A"]], axis=1).reshape(
+        n_models, n_fixtures, 3
+    )
+
+
+def pool_probs(probs: np.ndarray, weights=None, pooling="linear") -> np.ndarray:
+    """
+    Blends (n_models, n_fixtures, 3) probabilities into one (n_fixtures, 3) forecast.
+    linear is the weighted average, log the normalised weighted geometric mean which sharpens when the models agree
+    """
+    if pooling not in POOLING_METHODS:
+        raise ValueError(f"pooling must be one of {POOLING_METHODS}, not {pooling}")
+    n_models = probs.shape[0]
+    weights = np.full(n_models, 1 / n_models) if weights is None else weights
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+
+    if pooling == "linear":
+        return np.tensordot(weights, probs, axes=1)
+    log_pooled = np.tensordot(weights, np.log(probs), axes=1)
+    pooled = np.exp(log_pooled - log_pooled.max(axis=1, keepdims=True))
+    return pooled / pooled.sum(axis=1, keepdims=True)
+
+
+@instrument(items=n_rows)
+def predict_ensemble(
+    df: pd.DataFrame,
+    params_list: list,
+    weights=None,
+    pooling="linear",
+    bankroll=100,
+    kelly_fraction=0.05,
+    max_goals=10,
+) -> pd.DataFrame:
+    """
+    Prices every fixture (home, away, home_odds, draw_odds, away_odds columns) with any number of models in one
+    batched pass and blends them. Returns a row per fixture with the pooled probabilities, EVs, selection and
+    Kelly stake, plus the weighted share of models whose own pick agrees with the ensemble's
+    """
+    models = as_models(params_list)
+    probs = model_probs(models, df["home"], df["away"], max_goals)
+    pooled = pool_probs(probs, weights, pooling)
+    odds = [df[col].to_numpy() for col in ["home_odds", "draw_odds", "away_odds"]]
+
+    prediction = make_betting_predictions(
+        {"H": pooled[:, 0], "D": pooled[:, 1], "A": pooled[:, 2]},
+        *odds,
+        bankroll=bankroll,
+        kelly_fraction=kelly_fraction,
+    )
+
+    # each model's own pick, with the same tie breaking as make_betting_predictions
+    evs = probs * np.stack(odds, axis=1)[None] - 1
+    is_max = evs == evs.max(axis=2, keepdims=True)
+    model_choice = np.where(is_max[..., 2], 2, np.where(is_max[..., 1], 1, 0))
+    model_selection = SELECTIONS[model_choice]
+    agrees = model_selection == prediction["selection"].to_numpy()[None]
+    model_weights = (
+        np.full(len(models), 1 / len(models))
+        if weights is None
+        else np.asarray(weights, dtype=np.float64) / np.sum(weights)
+    )
+
+    prediction.insert(0, "away", df["away"].to_numpy())
+    prediction.insert(0, "home", df["home"].to_numpy())
+    prediction["agreement"] = model_weights @ agrees
+    prediction["unanimous"] = agrees.all(axis=0)
+    return prediction
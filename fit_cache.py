@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import OptimizeResult
+
+from dc_likelihood import EncodedMatches, encode_matches
+from dixon_coles import params_to_dict, solve_parameters_decay
+
+FIT_CACHE_DIR = os.environ.get("FOOTBALL_FIT_CACHE", "data/fit_cache")
+
+# the parts of the OptimizeResult that are kept, enough to rebuild the parameters and judge the fit
+RESULT_FIELDS = ("x", "fun", "nit", "nfev", "success", "status", "message")
+
+
+def fingerprint(matches: EncodedMatches, **settings) -> str:
+    """
+    A sha256 of the encoded matches and every setting that affects the fit (xi, options, init_vals etc).
+    Settings that can't be written as json (eg a lambda) fall back to their repr, so those fits never match
+    """
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, matches.teams)).encode())
+    for array in (
+        matches.home_idx,
+        matches.away_idx,
+        matches.home_goals,
+        matches.away_goals,
+        matches.time_diff,
+        matches.rho_param,
+        matches.home_adv_param,
+    ):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    settings = {
+        key: value.tolist() if isinstance(value, np.ndarray) else value
+        for key, value in settings.items()
+    }
+    digest.update(json.dumps(settings, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+
+class FitCache:
+    """
+    Remembers fits by fingerprint, in memory (the max_entries most recently used) and optionally on disk
+    as small .npz files, dropping the least recently used files once they take up more than max_disk_bytes
+    """
+
+    def __init__(
+        self, max_entries: int = 32, cache_dir=None, max_disk_bytes: int = 50 * 2**20
+    ):
+        self.max_entries = max_entries
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npz"
+
+    def get(self, key: str):
+        """
+        The cached OptimizeResult for key, or None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                # a copy of x so callers can't change what's cached
+                return OptimizeResult(
+                    self._memory[key], x=self._memory[key]["x"].copy()
+                )
+
+        result = None
+        if self.cache_dir is not None and self._path(key).exists():
+            with np.load(self._path(key)) as data:
+                result = {field: data[field][()] for field in RESULT_FIELDS}
+            result["x"] = np.asarray(result["x"])
+            # touching the file marks it as recently used for the disk eviction
+            os.utime(self._path(key))
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, result)
+        return OptimizeResult(result, x=result["x"].copy())
+
+    def put(self, key: str, opt_output) -> None:
+        result = {field: opt_output[field] for field in RESULT_FIELDS}
+        result["x"] = np.array(result["x"])
+        result["message"] = str(result["message"])
+        with self._lock:
+            self._remember(key, result)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(
+                f".{os.getpid()}.{threading.get_ident()}.tmp.npz"
+            )
+            np.savez(tmp_path, **result)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+
+    def _remember(self, key: str, result: dict) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        files = sorted(
+            (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".npz") and ".tmp" not in entry.name
+        )
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.npz"):
+                path.unlink()
+
+
+_default_cache = None
+
+
+def default_cache() -> FitCache:
+    """
+    The process wide cache, kept on disk in FIT_CACHE_DIR so it carries over between runs
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FitCache(cache_dir=FIT_CACHE_DIR)
+    return _default_cache
+
+
+def solve_parameters_cached(
+    dataset: pd.DataFrame,
+    xi=0.001,
+    debug=False,
+    init_vals=None,
+    options={"disp": False, "maxiter": 100},
+    cache: FitCache = None,
+    **kwargs,
+):
+    """
+    solve_parameters_decay with memoisation, an identical dataset and settings returns the earlier fit
+    without optimising. With debug the OptimizeResult has a cache_hit flag.
+    Fits from a random start (init_vals=None) are cached too, a rerun gets the first run's answer
+    """
+    cache = default_cache() if cache is None else cache
+    teams = np.sort(dataset["HomeTeam"].unique())
+    key = fingerprint(
+        encode_matches(dataset, teams=teams),
+        xi=xi,
+        init_vals=init_vals,
+        options=options,
+        **kwargs,
+    )
+
+    opt_output = cache.get(key)
+    if opt_output is None:
+        opt_output = solve_parameters_decay(
+            dataset, xi=xi, debug=True, init_vals=init_vals, options=options, **kwargs
+        )
+        cache.put(key, opt_output)
+        opt_output["cache_hit"] = False
+    else:
+        print("found a cached fit for this dataset, skipping the optimisation")
+        opt_output["cache_hit"] = True
+
+    if debug:
+        return opt_output
+    return params_to_dict(teams, opt_output.x)
@@ -4,12 +4,12 @@ from impyrial.validation.general import check_any_file_modification
 from config import premier_league_betting_data, current_season
 import warnings
 from datetime import date
+from model_registry import load_latest
 
 
 from utils.general_utils import (
     get_new_features,
     output_result_column,
-    prep_params,
     predict_whole_league,
 )
 
@@ -22,9 +22,9 @@ pd.options.mode.chained_assignment = None
 
 check_any_file_modification("data/models", 7)
 
-# Reading and preparing data
-params_2023_eo = pd.read_csv(f"data\models\model20232025E0.csv").pipe(prep_params)
-params_2024_eo = pd.read_csv(f"data\models\model20242025E0.csv").pipe(prep_params)
+# Loading the latest fitted models, memory mapped as only a few teams are looked up
+params_2023_eo = load_latest("E0", 2023, 2025, mmap=True)
+params_2024_eo = load_latest("E0", 2024, 2025, mmap=True)
 
 combined_params = [params_2023_eo, params_2024_eo]
 
@@ -0,0 +1,150 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+OVER_UNDER_LINES = (0.5, 1.5, 2.5, 3.5, 4.5, 5.5)
+
+# quarter lines split the stake across the two neighbouring half / whole lines
+ASIAN_HANDICAP_LINES = tuple(float(line) for line in np.arange(-2.5, 2.75, 0.25))
+
+
+@lru_cache
+def _market_masks(max_goals: int):
+    """
+    One hot maps from every cell of a flattened score matrix to its goal difference (home - away)
+    and its total goals, both offset so they index from zero
+    """
+    home_goals, away_goals = np.indices((max_goals + 1, max_goals + 1))
+    n_cells = (max_goals + 1) ** 2
+    cells = np.arange(n_cells)
+
+    diff_map = np.zeros((n_cells, 2 * max_goals + 1))
+    diff_map[cells, (home_goals - away_goals).ravel() + max_goals] = 1
+    total_map = np.zeros((n_cells, 2 * max_goals + 1))
+    total_map[cells, (home_goals + away_goals).ravel()] = 1
+    return diff_map, total_map
+
+
+def _distributions(score_tensor: np.ndarray):
+    """
+    The goal difference and total goals distributions for every match in the tensor
+    """
+    score_tensor = np.asarray(score_tensor)
+    max_goals = score_tensor.shape[-1] - 1
+    diff_map, total_map = _market_masks(max_goals)
+    flat = score_tensor.reshape(len(score_tensor), -1)
+    return flat @ diff_map, flat @ total_map, flat.sum(axis=1)
+
+
+def outcome_probs(score_tensor: np.ndarray) -> dict:
+    """
+    The home / draw / away probabilities for every match in an (n_matches, G + 1, G + 1) tensor
+    """
+    max_goals = np.shape(score_tensor)[-1] - 1
+    diff_dist, _, _ = _distributions(score_tensor)
+    return {
+        "H": diff_dist[:, max_goals + 1 :].sum(axis=1),
+        "D": diff_dist[:, max_goals],
+        "A": diff_dist[:, :max_goals].sum(axis=1),
+    }
+
+
+def _cdf_at(cdf: np.ndarray, mass: np.ndarray, k: int, max_goals: int) -> np.ndarray:
+    """
+    P(goal difference <= k) read off the cumulative distribution, which is indexed from -max_goals
+    """
+    if k < -max_goals:
+        return np.zeros(len(cdf))
+    if k >= max_goals:
+        return mass
+    return cdf[:, k + max_goals]
+
+
+def _asian_handicap_odds(
+    diff_dist: np.ndarray, cdf: np.ndarray, mass: np.ndarray, line: float
+):
+    """
+    The fair home and away decimal odds for an asian handicap of line goals given to the home team
+    """
+    max_goals = (diff_dist.shape[1] - 1) // 2
+    if (line * 2) % 1 == 0:
+        components = [line]
+    else:
+        components = [line - 0.25, line + 0.25]
+
+    home_win = np.zeros(len(mass))
+    away_win = np.zeros(len(mass))
+    push = np.zeros(len(mass))
+    for component in components:
+        # the home side wins when the goal difference is more than -component
+        threshold = -component
+        home_win += mass - _cdf_at(cdf, mass, int(np.floor(threshold)), max_goals)
+        away_win += _cdf_at(cdf, mass, int(np.ceil(threshold)) - 1, max_goals)
+        if threshold % 1 == 0 and abs(threshold) <= max_goals:
+            push += diff_dist[:, int(threshold) + max_goals]
+    home_win, away_win, push = (
+        home_win / len(components),
+        away_win / len(components),
+        push / len(components),
+    )
+    return (mass - push) / home_win, (mass - push) / away_win
+
+
+def derive_markets(
+    score_tensor: np.ndarray,
+    over_under_lines=OVER_UNDER_LINES,
+    asian_handicap_lines=ASIAN_HANDICAP_LINES,
+    correct_score_max: int = 4,
+) -> pd.DataFrame:
+    """
+    Prices every market for every match from an (n_matches, G + 1, G + 1) score tensor in one pass.
+    1x2, double chance, over / under, both teams to score and correct score columns are probabilities,
+    asian handicap columns are fair decimal odds for the home side at the line and the away side at minus the line
+    """
+    score_tensor = np.asarray(score_tensor)
+    max_goals = score_tensor.shape[-1] - 1
+    diff_dist, total_dist, mass = _distributions(score_tensor)
+
+    home = diff_dist[:, max_goals + 1 :].sum(axis=1)
+    draw = diff_dist[:, max_goals]
+    away = diff_dist[:, :max_goals].sum(axis=1)
+    markets = {
+        "H": home,
+        "D": draw,
+        "A": away,
+        "1X": home + draw,
+        "X2": draw + away,
+        "12": home + away,
+    }
+
+    total_cdf = np.cumsum(total_dist, axis=1)
+    for line in over_under_lines:
+        under = total_cdf[:, min(int(np.floor(line)), 2 * max_goals)]
+        markets[f"under_{line}"] = under
+        markets[f"over_{line}"] = mass - under
+
+    no_home_goal = score_tensor[:, 0, :].sum(axis=1)
+    no_away_goal = score_tensor[:, :, 0].sum(axis=1)
+    btts = mass - no_home_goal - no_away_goal + score_tensor[:, 0, 0]
+    markets["btts_yes"] = btts
+    markets["btts_no"] = mass - btts
+
+    correct_score_max = min(correct_score_max, max_goals)
+    for home_goals in range(correct_score_max + 1):
+        for away_goals in range(correct_score_max + 1):
+            markets[f"cs_{home_goals}_{away_goals}"] = score_tensor[
+                :, home_goals, away_goals
+            ]
+    markets["cs_other"] = mass - score_tensor[
+        :, : correct_score_max + 1, : correct_score_max + 1
+    ].sum(axis=(1, 2))
+
+    diff_cdf = np.cumsum(diff_dist, axis=1)
+    for line in asian_handicap_lines:
+        home_odds, away_odds = _asian_handicap_odds(diff_dist, diff_cdf, mass, line)
+        markets[f"ah_home_{line:+g}"] = home_odds
+        # adding zero stops the level line being labelled -0
+        markets[f"ah_away_{-line + 0.0:+g}"] = away_odds
+
+    return pd.DataFrame(markets)
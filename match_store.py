@@ -0,0 +1,124 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.environ.get("FOOTBALL_DATA_STORE", "data/store")
+
+# the columns that identify a fixture within a (Div, season) partition
+KEY_COLUMNS = ["Date", "HomeTeam", "AwayTeam"]
+
+GOAL_COLUMNS = ["FTHG", "FTAG", "HTHG", "HTAG"]
+
+CATEGORY_COLUMNS = ["HomeTeam", "AwayTeam", "FTR", "HTR", "Referee"]
+
+
+def season_from_date(dates: pd.Series) -> pd.Series:
+    """
+    The football-data season code (eg 2324) for each match date, seasons turning over in July
+    """
+    start_year = dates.dt.year - (dates.dt.month < 7)
+    return (start_year % 100).map("{:02d}".format) + ((start_year + 1) % 100).map(
+        "{:02d}".format
+    )
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Teams and other labels as categories, goals as int8 and everything else numeric (odds, shots etc) as float32.
+    Goal columns with missing values stay as float32
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in KEY_COLUMNS[:1] or col in ("Div", "season"):
+            continue
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col in GOAL_COLUMNS and df[col].notna().all():
+            df[col] = df[col].astype(np.int8)
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def _partition_dir(store_dir, div: str, season: str) -> Path:
+    return Path(store_dir) / f"Div={div}" / f"season={season}"
+
+
+def append_matches(df: pd.DataFrame, store_dir=None) -> int:
+    """
+    Adds the played matches in df that aren't already stored, partitioned by (Div, season).
+    df needs Div and the key columns, season is worked out from the date if it's missing.
+    Returns the number of new matches written
+    """
+    store_dir = STORE_DIR if store_dir is None else store_dir
+    df = df[df["FTHG"].notna() & df["FTAG"].notna()]
+    if "season" not in df.columns:
+        df = df.assign(season=season_from_date(df["Date"]))
+
+    n_written = 0
+    for (div, season), partition in df.groupby(["Div", "season"], observed=True):
+        partition_dir = _partition_dir(store_dir, div, season)
+        if partition_dir.exists():
+            stored_keys = pd.read_parquet(partition_dir, columns=KEY_COLUMNS)
+            stored_keys = stored_keys.astype({"HomeTeam": str, "AwayTeam": str})
+            partition = partition.merge(
+                stored_keys.assign(_stored=True), on=KEY_COLUMNS, how="left"
+            )
+            partition = partition[partition["_stored"].isna()].drop(columns="_stored")
+        if len(partition) == 0:
+            continue
+
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        partition = compact_dtypes(partition.drop(columns=["Div", "season"]))
+        partition.to_parquet(
+            partition_dir / f"part-{time.time_ns()}.parquet", index=False
+        )
+        n_written += len(partition)
+    return n_written
+
+
+def read_matches(
+    store_dir=None,
+    columns: list[str] = None,
+    divs: list[str] = None,
+    seasons: list[str] = None,
+    start_date=None,
+    end_date=None,
+) -> pd.DataFrame:
+    """
+    Reads back only the requested columns and the matches in the given divisions, seasons and date range
+    """
+    store_dir = STORE_DIR if store_dir is None else store_dir
+    filters = []
+    if divs is not None:
+        filters.append(("Div", "in", list(divs)))
+    if seasons is not None:
+        filters.append(("season", "in", [str(season) for season in seasons]))
+    if start_date is not None:
+        filters.append(("Date", ">=", pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(("Date", "<=", pd.Timestamp(end_date)))
+
+    df = pd.read_parquet(store_dir, columns=columns, filters=filters or None)
+    if "Date" in df.columns:
+        df = df.sort_values("Date", kind="stable").reset_index(drop=True)
+    return df
+
+
+def compact_store(store_dir=None) -> None:
+    """
+    Rewrites every partition that has built up several appended parts as a single file
+    """
+    store_dir = STORE_DIR if store_dir is None else store_dir
+    for partition_dir in Path(store_dir).glob("Div=*/season=*"):
+        parts = sorted(partition_dir.glob("part-*.parquet"))
+        if len(parts) < 2:
+            continue
+        df = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+        df = compact_dtypes(df.sort_values("Date", kind="stable"))
+        df.to_parquet(partition_dir / f"part-{time.time_ns()}.parquet", index=False)
+        for part in parts:
+            part.unlink()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dc_model import DixonColesModel
+
+REGISTRY_DIR = os.environ.get("FOOTBALL_MODEL_REGISTRY", "data/models/registry")
+
+# each array is its own .npy file so they can be memory mapped, which .npz doesn't allow
+ARRAYS = ("teams", "attack", "defence")
+
+
+def dataset_hash(dataset: pd.DataFrame) -> str:
+    """
+    A sha256 of the dataset's contents (not its index), to tell which data a model was fitted on
+    """
+    row_hashes = pd.util.hash_pandas_object(dataset, index=False).to_numpy()
+    column_names = "\x1f".join(map(str, dataset.columns)).encode()
+    return hashlib.sha256(column_names + row_hashes.tobytes()).hexdigest()
+
+
+def _window_dir(registry_dir, league: str, start_year, end_year) -> Path:
+    return Path(registry_dir) / league / f"{start_year}-{end_year}"
+
+
+def save_model(
+    model: DixonColesModel,
+    league: str,
+    start_year: int,
+    end_year: int,
+    registry_dir=None,
+    **metadata,
+) -> Path:
+    """
+    Adds a new version of the model for this league and window, keeping all the older versions.
+    metadata is stored alongside it in meta.json, eg xi, fit_time, log_likelihood and data_hash.
+    Returns the version's directory
+    """
+    registry_dir = REGISTRY_DIR if registry_dir is None else registry_dir
+    window_dir = _window_dir(registry_dir, league, start_year, end_year)
+    # versions are named by creation time so they sort in the order they were made
+    created_ns = time.time_ns()
+    version = (
+        time.strftime("%Y%m%dT%H%M%S", time.gmtime(created_ns // 10**9))
+        + f"_{created_ns % 10**9:09d}"
+    )
+
+    # written under a temporary name and renamed so a half written version is never loaded
+    tmp_dir = window_dir / f".{version}.tmp"
+    tmp_dir.mkdir(parents=True)
+    for name in ARRAYS:
+        np.save(tmp_dir / f"{name}.npy", getattr(model, name))
+    meta = {
+        "version": version,
+        "league": league,
+        "start_year": start_year,
+        "end_year": end_year,
+        "n_teams": len(model),
+        "rho": model.rho,
+        "home_adv": model.home_adv,
+        "created_at": created_ns / 1e9,
+        **metadata,
+    }
+    with open(tmp_dir / "meta.json", "w") as f:
+        json.dump(meta, f, indent=1, default=float)
+    version_dir = window_dir / version
+    os.replace(tmp_dir, version_dir)
+    return version_dir
+
+
+def list_versions(league: str, start_year, end_year, registry_dir=None) -> list[str]:
+    """
+    The saved versions for a league and window, oldest first
+    """
+    registry_dir = REGISTRY_DIR if registry_dir is None else registry_dir
+    window_dir = _window_dir(registry_dir, league, start_year, end_year)
+    if not window_dir.exists():
+        return []
+    return sorted(
+        entry.name
+        for entry in os.scandir(window_dir)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+
+
+def load_model(
+    league: str,
+    start_year,
+    end_year,
+    version: str = None,
+    mmap: bool = False,
+    registry_dir=None,
+):
+    """
+    Loads a version of the model (the latest if version isn't given) and its metadata.
+    With mmap the arrays are memory mapped rather than read into memory
+    """
+    registry_dir = REGISTRY_DIR if registry_dir is None else registry_dir
+    if version is None:
+        versions = list_versions(league, start_year, end_year, registry_dir)
+        if not versions:
+            raise FileNotFoundError(
+                f"no models saved for {league} {start_year}-{end_year} in {registry_dir}"
+            )
+        version = versions[-1]
+    version_dir = _window_dir(registry_dir, league, start_year, end_year) / version
+
+    with open(version_dir / "meta.json") as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(version_dir / f"{name}.npy", mmap_mode="r" if mmap else None)
+        for name in ARRAYS
+    }
+    model = DixonColesModel(
+        arrays["teams"],
+        arrays["attack"],
+        arrays["defence"],
+        meta["rho"],
+        meta["home_adv"],
+    )
+    return model, meta
+
+
+def latest_meta(league: str, start_year, end_year, registry_dir=None):
+    """
+    The metadata of the latest version for a league and window, or None if nothing's been saved
+    """
+    registry_dir = REGISTRY_DIR if registry_dir is None else registry_dir
+    versions = list_versions(league, start_year, end_year, registry_dir)
+    if not versions:
+        return None
+    window_dir = _window_dir(registry_dir, league, start_year, end_year)
+    with open(window_dir / versions[-1] / "meta.json") as f:
+        return json.load(f)
+
+
+def load_latest(
+    league: str, start_year, end_year, mmap: bool = False, registry_dir=None
+):
+    """
+    The latest model for a league and window, without its metadata
+    """
+    return load_model(
+        league, start_year, end_year, mmap=mmap, registry_dir=registry_dir
+    )[0]
+
+
+def version_history(
+    league: str, start_year, end_year, registry_dir=None
+) -> pd.DataFrame:
+    """
+    The metadata of every saved version for a league and window, oldest first
+    """
+    registry_dir = REGISTRY_DIR if registry_dir is None else registry_dir
+    window_dir = _window_dir(registry_dir, league, start_year, end_year)
+    rows = []
+    for version in list_versions(league, start_year, end_year, registry_dir):
+        with open(window_dir / version / "meta.json") as f:
+            rows.append(json.load(f))
+    return pd.DataFrame(rows)
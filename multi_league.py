@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import LinearConstraint
+
+from dc_likelihood import dc_hessian_sparse, encode_matches, match_weights
+from dixon_coles import (
+    HESSIAN_METHODS,
+    fit_encoded,
+    fit_encoded_centred,
+    params_to_dict,
+)
+from profiling import instrument
+
+
+def team_leagues(dataset: pd.DataFrame, leagues, league_col: str = "Div") -> pd.Series:
+    """
+    The league each team belongs to, the one it's played most of its matches in.
+    Matches outside leagues (eg cup or European fixtures) don't count towards membership
+    """
+    league_matches = dataset[dataset[league_col].isin(leagues)]
+    appearances = pd.concat(
+        [
+            league_matches[["HomeTeam", league_col]].set_axis(
+                ["team", "league"], axis=1
+            ),
+            league_matches[["AwayTeam", league_col]].set_axis(
+                ["team", "league"], axis=1
+            ),
+        ]
+    )
+    return appearances.groupby("team")["league"].agg(
+        lambda s: s.value_counts().idxmax()
+    )
+
+
+def encode_leagues(
+    dataset: pd.DataFrame,
+    leagues=None,
+    league_col: str = "Div",
+    shared_rho: bool = False,
+    shared_home_adv: bool = False,
+):
+    """
+    Encodes the matches of several leagues (plus any fixtures between them) for a single joint fit.
+    Each match uses the rho / home advantage of its home team's league unless they're shared.
+    Returns the encoded matches, each team's league as an index into leagues, and the leagues
+    """
+    if leagues is None:
+        leagues = np.sort(dataset[league_col].unique())
+    leagues = list(leagues)
+    membership = team_leagues(dataset, leagues, league_col)
+
+    teams = np.sort(pd.concat([dataset["HomeTeam"], dataset["AwayTeam"]]).unique())
+    missing = np.setdiff1d(teams, membership.index)
+    if len(missing) > 0:
+        raise ValueError(f"these teams haven't played a match in {leagues}: {missing}")
+    team_league = pd.Categorical(membership[teams], categories=leagues).codes
+    home_league = pd.Categorical(
+        membership[dataset["HomeTeam"]], categories=leagues
+    ).codes
+
+    matches = encode_matches(
+        dataset,
+        teams=teams,
+        rho_group=None if shared_rho else home_league,
+        home_adv_group=None if shared_home_adv else home_league,
+    )
+    return matches, team_league.astype(np.int64), leagues
+
+
+def league_constraint(matches, team_league: np.ndarray, n_leagues: int):
+    """
+    The attack strengths of every league average one, as a single sparse linear constraint
+    """
+    n_teams = matches.n_teams
+    coefficients = sparse.csr_matrix(
+        (np.ones(n_teams), (team_league, np.arange(n_teams))),
+        shape=(n_leagues, matches.n_params),
+    )
+    league_sizes = np.bincount(team_league, minlength=n_leagues)
+    return LinearConstraint(coefficients, league_sizes, league_sizes)
+
+
+def league_params(matches, team_league: np.ndarray, leagues, values) -> dict:
+    """
+    Splits a joint fit into one attack_ / defence_ / rho / home_adv dictionary per league,
+    the same shape as solve_parameters_decay returns so each can be used on its own.
+    The strengths share a scale across leagues when they're linked by fixtures between them
+    """
+    n_teams = matches.n_teams
+    output = {}
+    for league_idx, league in enumerate(leagues):
+        in_league = team_league == league_idx
+        rho = values[2 * n_teams + (league_idx if matches.n_rho > 1 else 0)]
+        home_adv = values[
+            2 * n_teams + matches.n_rho + (league_idx if matches.n_home_adv > 1 else 0)
+        ]
+        output[league] = params_to_dict(
+            matches.teams[in_league],
+            np.concatenate(
+                (
+                    values[:n_teams][in_league],
+                    values[n_teams : (2 * n_teams)][in_league],
+                    [rho, home_adv],
+                )
+            ),
+        )
+    return output
+
+
+@instrument()
+def fit_leagues(
+    dataset: pd.DataFrame,
+    xi=0.001,
+    leagues=None,
+    league_col: str = "Div",
+    shared_rho: bool = False,
+    shared_home_adv: bool = False,
+    init_vals=None,
+    debug=False,
+    options={"disp": False, "maxiter": 1000},
+    solver="trust-constr",
+    **kwargs
+):
+    """
+    Fits every league in dataset in one model, with a mean attack of one in each league and
+    either per league or shared rho / home advantage.
+    This uses trust-constr with the sparse Hessian by default, which scales to ~100 teams where SLSQP's
+    dense approximations don't. solver="lbfgsb" centres each league's attack instead of constraining it,
+    so it raises a ValueError if constraints are passed.
+    Returns a parameter dictionary per league (or the OptimizeResult if debug)
+    """
+    matches, team_league, leagues = encode_leagues(
+        dataset, leagues, league_col, shared_rho, shared_home_adv
+    )
+    weights = match_weights(matches, xi=xi)
+    if init_vals is None:
+        # a neutral start that already satisfies the constraints
+        init_vals = np.concatenate(
+            (
+                np.ones(matches.n_teams),
+                -np.ones(matches.n_teams),
+                np.zeros(matches.n_rho),
+                np.full(matches.n_home_adv, 0.25),
+            )
+        )
+
+    if solver == "lbfgsb":
+        opt_output = fit_encoded_centred(
+            matches,
+            weights,
+            init_vals=init_vals,
+            options=options,
+            team_group=team_league,
+            **kwargs
+        )
+    else:
+        kwargs.setdefault("method", solver)
+        if kwargs["method"] in HESSIAN_METHODS and "hessp" not in kwargs:
+            kwargs.setdefault(
+                "hess", lambda params: -dc_hessian_sparse(params, matches, weights)
+            )
+        opt_output = fit_encoded(
+            matches,
+            weights,
+            init_vals=init_vals,
+            options=options,
+            constraints=[league_constraint(matches, team_league, len(leagues))],
+            **kwargs
+        )
+    if debug:
+        return opt_output
+    return league_params(matches, team_league, leagues, opt_output.x)
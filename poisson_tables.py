@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+from scipy.special import xlogy
+
+# goals rarely go past 10 so the table starts there and grows the first time more is asked for
+_log_factorial = np.array([math.lgamma(k + 1) for k in range(11)])
+
+
+def log_factorial_table(max_goals: int) -> np.ndarray:
+    """
+    log(k!) for k = 0 ... max_goals, extending the cached table (by doubling) if it isn't long enough yet
+    """
+    global _log_factorial
+    if max_goals >= len(_log_factorial):
+        size = max(max_goals + 1, 2 * len(_log_factorial))
+        # built in full before being swapped in so other threads never see a half filled table
+        _log_factorial = np.array([math.lgamma(k + 1) for k in range(size)])
+    return _log_factorial[: max_goals + 1]
+
+
+def log_factorial(goals):
+    """
+    log(k!) for every non-negative integer number of goals (a scalar or an array)
+    """
+    goals = np.asarray(goals, dtype=np.int64)
+    max_goals = int(goals.max()) if goals.size else 0
+    return log_factorial_table(max_goals)[goals]
+
+
+def poisson_log_pmf(goals, expected_goals):
+    """
+    The poisson log probability k * log(mu) - mu - log(k!) of goals given their expectation, broadcasting like numpy
+    """
+    # xlogy makes 0 * log(0) zero so zero goals has probability one when nothing is expected
+    return xlogy(goals, expected_goals) - expected_goals - log_factorial(goals)
+
+
+def poisson_pmf(goals, expected_goals):
+    return np.exp(poisson_log_pmf(goals, expected_goals))
+
+
+def poisson_pmf_table(expected_goals, max_goals: int = 10) -> np.ndarray:
+    """
+    The probability of 0 ... max_goals goals for each expectation, as an (n, max_goals + 1) array
+    """
+    expected_goals = np.asarray(expected_goals, dtype=np.float64).reshape(-1, 1)
+    goals = np.arange(max_goals + 1)
+    return np.exp(
+        xlogy(goals, expected_goals) - expected_goals - log_factorial_table(max_goals)
+    )
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from dixon_coles import SELECTIONS
+from ensemble import as_models, model_probs, pool_probs
+from profiling import instrument, n_rows
+
+
+def candidate_bets(probs: np.ndarray, odds: np.ndarray, min_ev=0.0):
+    """
+    Every (match, outcome) on the slate whose EV is above min_ev, as arrays of match and outcome indices
+    """
+    evs = probs * odds - 1
+    match_idx, outcome_idx = np.nonzero(np.nan_to_num(evs, nan=-np.inf) > min_ev)
+    return match_idx, outcome_idx
+
+
+def outcome_scenarios(
+    probs: np.ndarray, max_enumerated: int = 10, n_samples: int = 20000, seed=None
+):
+    """
+    Joint H / D / A outcomes of the matches (0 home, 1 draw, 2 away) as an (n_scenarios, n_matches) array
+    with the probability of each. All 3^n combinations are enumerated for up to max_enumerated matches,
+    above that n_samples equally weighted scenarios are drawn instead
+    """
+    n_matches = len(probs)
+    if n_matches <= max_enumerated:
+        outcomes = np.indices((3,) * n_matches).reshape(n_matches, -1).T
+        scenario_probs = np.prod(probs[np.arange(n_matches), outcomes], axis=1)
+        return outcomes, scenario_probs / scenario_probs.sum()
+
+    rng = np.random.default_rng(seed)
+    cumulative = np.cumsum(probs, axis=1)
+    draws = rng.random((n_samples, n_matches, 1))
+    outcomes = (draws > cumulative[None, :, :2]).sum(axis=2)
+    return outcomes, np.full(n_samples, 1 / n_samples)
+
+
+def growth_optimal_stakes(
+    probs: np.ndarray,
+    odds: np.ndarray,
+    match_idx: np.ndarray,
+    outcome_idx: np.ndarray,
+    max_exposure=1.0,
+    max_enumerated: int = 10,
+    n_samples: int = 20000,
+    seed=None,
+):
+    """
+    The bankroll fractions that maximise the expected log bankroll when all the candidate bets are placed
+    together, assuming the matches are independent. Stakes are non-negative and add up to at most max_exposure.
+    Returns the fractions and the expected log growth
+    """
+    if len(match_idx) == 0:
+        return np.zeros(0), 0.0
+    # only matches with a candidate bet change the bankroll
+    slate_matches, slate_idx = np.unique(match_idx, return_inverse=True)
+    outcomes, scenario_probs = outcome_scenarios(
+        probs[slate_matches], max_enumerated, n_samples, seed
+    )
+    # profit per unit staked on every candidate in every scenario
+    won = outcomes[:, slate_idx] == outcome_idx[None]
+    payoff = np.where(won, odds[match_idx, outcome_idx][None] - 1, -1.0)
+
+    def neg_growth(fractions):
+        wealth = np.maximum(1 + payoff @ fractions, 1e-12)
+        value = -scenario_probs @ np.log(wealth)
+        grad = -(scenario_probs / wealth) @ payoff
+        return value, grad
+
+    # independent Kelly, scaled down if it over commits, is a good start
+    b = odds[match_idx, outcome_idx] - 1
+    p = probs[match_idx, outcome_idx]
+    init_vals = np.maximum((b * p - (1 - p)) / b, 0)
+    if init_vals.sum() > max_exposure:
+        init_vals *= max_exposure / init_vals.sum()
+
+    opt_output = minimize(
+        neg_growth,
+        init_vals,
+        jac=True,
+        method="SLSQP",
+        bounds=[(0, max_exposure)] * len(init_vals),
+        constraints=[
+            {
+                "type": "ineq",
+                "fun": lambda fractions: max_exposure - fractions.sum(),
+                "jac": lambda fractions: -np.ones_like(fractions),
+            }
+        ],
+        options={"maxiter": 200, "ftol": 1e-12},
+    )
+    # SLSQP leaves dust on the bets it drops
+    fractions = np.where(opt_output.x > 1e-9, opt_output.x, 0.0)
+    return fractions, -neg_growth(fractions)[0]
+
+
+def slate_stakes(
+    probs: np.ndarray,
+    odds: np.ndarray,
+    bankroll=100,
+    kelly_fraction=0.05,
+    min_ev=0.0,
+    max_exposure=1.0,
+    **kwargs
+) -> pd.DataFrame:
+    """
+    Joint Kelly stakes for a whole matchday of (n_matches, 3) H / D / A probabilities and odds.
+    Every positive EV selection is a candidate, more than one per match if they're both value.
+    The growth optimal fractions are scaled by kelly_fraction like kelly_criterion, so a lone bet gets the same
+    stake as kelly_criterion would give it and a busy matchday gets less than the independent stakes add up to
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+    match_idx, outcome_idx = candidate_bets(probs, odds, min_ev)
+    fractions, _ = growth_optimal_stakes(
+        probs, odds, match_idx, outcome_idx, max_exposure=max_exposure, **kwargs
+    )
+
+    b = odds[match_idx, outcome_idx] - 1
+    p = probs[match_idx, outcome_idx]
+    return pd.DataFrame(
+        {
+            "fixture": match_idx,
+            "selection": SELECTIONS[outcome_idx],
+            "prob": p,
+            "odds": b + 1,
+            "ev": p * (b + 1) - 1,
+            "independent_stake": np.maximum((b * p - (1 - p)) / b, 0)
+            * kelly_fraction
+            * bankroll,
+            "stake": fractions * kelly_fraction * bankroll,
+        }
+    )
+
+
+@instrument(items=n_rows)
+def predict_slate(
+    df: pd.DataFrame,
+    params_list: list,
+    weights=None,
+    pooling="linear",
+    bankroll=100,
+    kelly_fraction=0.05,
+    **kwargs
+) -> pd.DataFrame:
+    """
+    Prices a matchday (home, away, home_odds, draw_odds, away_odds columns, like predict_whole_league takes)
+    with one or more models and stakes all its value bets together with slate_stakes
+    """
+    probs = pool_probs(
+        model_probs(as_models(params_list), df["home"], df["away"]), weights, pooling
+    )
+    odds = df[["home_odds", "draw_odds", "away_odds"]].to_numpy(dtype=np.float64)
+    stakes = slate_stakes(
+        probs, odds, bankroll=bankroll, kelly_fraction=kelly_fraction, **kwargs
+    )
+    stakes.insert(1, "away", df["away"].to_numpy()[stakes["fixture"]])
+    stakes.insert(1, "home", df["home"].to_numpy()[stakes["fixture"]])
+    return stakes
@@ -0,0 +1,170 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from scipy.optimize import OptimizeResult
+
+# the profilers currently recording, instrumented code does nothing extra while this is empty
+_active = []
+_lock = threading.Lock()
+
+# the OptimizeResult counters added up for instrumented fits
+OPTIMIZE_COUNTERS = ("nfev", "njev", "nhev", "nit")
+
+
+class Profiler:
+    """
+    Collects the call counts and timings of every instrumented function run while it's active.
+    metadata (eg the commit or machine) is carried into the json report so nightly runs can be compared
+    """
+
+    def __init__(self, **metadata):
+        self.metadata = metadata
+        self.records = {}
+        self.started_at = None
+        self.wall_time = None
+
+    def record(self, name: str, seconds: float, items=None, result=None) -> None:
+        stats = self.records.setdefault(
+            name,
+            {
+                "calls": 0,
+                "total_s": 0.0,
+                "min_s": float("inf"),
+                "max_s": 0.0,
+                "items": 0,
+                **{counter: 0 for counter in OPTIMIZE_COUNTERS},
+            },
+        )
+        stats["calls"] += 1
+        stats["total_s"] += seconds
+        stats["min_s"] = min(stats["min_s"], seconds)
+        stats["max_s"] = max(stats["max_s"], seconds)
+        if items is not None:
+            stats["items"] += int(items)
+        if isinstance(result, OptimizeResult):
+            for counter in OPTIMIZE_COUNTERS:
+                stats[counter] += int(result.get(counter, 0))
+
+    def report(self) -> pd.DataFrame:
+        """
+        A row per instrumented name with its calls, total / mean / min / max seconds, items processed per second
+        and, for fits, the summed objective (nfev), gradient (njev) and Hessian (nhev) evaluations and iterations
+        """
+        report = pd.DataFrame.from_dict(self.records, orient="index")
+        if report.empty:
+            return report
+        report.index.name = "name"
+        report.insert(2, "mean_s", report["total_s"] / report["calls"])
+        report["items_per_s"] = (report["items"] / report["total_s"]).where(
+            report["items"] > 0
+        )
+        return report.sort_values("total_s", ascending=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "wall_s": self.wall_time,
+            "metadata": self.metadata,
+            "records": self.records,
+        }
+
+    def to_json(self, path=None) -> str:
+        """
+        The report as json, also written to path if it's given
+        """
+        output = json.dumps(self.to_dict(), indent=1, default=str)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(output)
+        return output
+
+
+@contextmanager
+def profile(**metadata):
+    """
+    Records every instrumented call inside the with block:
+
+        with profile(commit="abc123") as profiler:
+            solve_parameters_decay(dataset)
+        profiler.report()
+    """
+    profiler = Profiler(**metadata)
+    profiler.started_at = time.time()
+    start = time.perf_counter()
+    with _lock:
+        _active.append(profiler)
+    try:
+        yield profiler
+    finally:
+        with _lock:
+            _active.remove(profiler)
+        profiler.wall_time = time.perf_counter() - start
+
+
+def _record(name: str, seconds: float, items=None, result=None) -> None:
+    with _lock:
+        for profiler in _active:
+            profiler.record(name, seconds, items, result)
+
+
+@contextmanager
+def timed(name: str, items=None):
+    """
+    Times the with block under name if a profiler is active, items is how many things it processed
+    """
+    if not _active:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start, items)
+
+
+def instrument(name: str = None, items=None):
+    """
+    Decorator that times every call of the function while a profiler is active, otherwise it costs one check.
+    items is an optional function of (result, *args, **kwargs) giving how many things the call processed,
+    for throughput. OptimizeResults have their evaluation counts recorded too
+    """
+
+    def decorator(func):
+        label = func.__qualname__ if name is None else name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            _record(
+                label,
+                seconds,
+                None if items is None else items(result, *args, **kwargs),
+                result,
+            )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def n_rows(result, *args, **kwargs) -> int:
+    """
+    An items function for calls that return a DataFrame or array with a row per thing processed
+    """
+    return len(result)
+
+
+def n_matches(result, params, matches, *args, **kwargs) -> int:
+    """
+    An items function for the likelihood functions, which all take (params, matches, ...)
+    """
+    return len(matches)
@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dixon_coles import dixon_coles_simulate_matches
+from profiling import instrument
+
+TABLE_COLUMNS = ["points", "goal_diff", "goals_for"]
+
+# set in each worker process so the fixtures aren't pickled with every chunk
+_worker_state = {}
+
+
+def league_table(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Points, goal difference and goals scored for every team from played matches (HomeTeam, AwayTeam, FTHG, FTAG)
+    """
+    home = pd.DataFrame(
+        {
+            "team": results["HomeTeam"].to_numpy(),
+            "points": 3 * (results["FTHG"] > results["FTAG"]).to_numpy()
+            + (results["FTHG"] == results["FTAG"]).to_numpy(),
+            "goal_diff": (results["FTHG"] - results["FTAG"]).to_numpy(),
+            "goals_for": results["FTHG"].to_numpy(),
+        }
+    )
+    away = pd.DataFrame(
+        {
+            "team": results["AwayTeam"].to_numpy(),
+            "points": 3 * (results["FTAG"] > results["FTHG"]).to_numpy()
+            + (results["FTHG"] == results["FTAG"]).to_numpy(),
+            "goal_diff": (results["FTAG"] - results["FTHG"]).to_numpy(),
+            "goals_for": results["FTAG"].to_numpy(),
+        }
+    )
+    return pd.concat([home, away]).groupby("team")[TABLE_COLUMNS].sum()
+
+
+def _init_worker(state: dict) -> None:
+    _worker_state.update(state)
+
+
+def _simulate_chunk(seed_seq, n_sims: int, state: dict = None):
+    """
+    Plays the remaining fixtures n_sims times and counts how often each team finishes in each position.
+    Scores are drawn for every fixture at once by inverting its cumulative score distribution, offset by the
+    fixture's index so one searchsorted covers the lot
+    """
+    state = _worker_state if state is None else state
+    rng = np.random.default_rng(seed_seq)
+    cdf, n_goals = state["cdf"], state["n_goals"]
+    n_fixtures, n_teams = len(state["home_idx"]), len(state["initial"])
+
+    draws = rng.random((n_sims, n_fixtures)) + np.arange(n_fixtures)
+    scores = (
+        np.searchsorted(cdf, draws, side="right") - np.arange(n_fixtures) * n_goals**2
+    )
+    scores = np.minimum(scores, n_goals**2 - 1)
+    home_goals, away_goals = (
+        goals.astype(np.float64) for goals in np.divmod(scores, n_goals)
+    )
+
+    home_points = 3 * (home_goals > away_goals) + (home_goals == away_goals)
+    away_points = 3 * (away_goals > home_goals) + (home_goals == away_goals)
+    # (n_sims, n_teams) totals, one matrix product each with the fixtures' home / away team indicators.
+    # These are floats because numpy's integer matmul doesn't use BLAS, the totals are still exact
+    home_onehot, away_onehot = state["home_onehot"], state["away_onehot"]
+    points = home_points @ home_onehot + away_points @ away_onehot
+    goal_diff = (home_goals - away_goals) @ (home_onehot - away_onehot)
+    goals_for = home_goals @ home_onehot + away_goals @ away_onehot
+    points += state["initial"][:, 0]
+    goal_diff += state["initial"][:, 1]
+    goals_for += state["initial"][:, 2]
+
+    # points, then goal difference, then goals scored, with anything still level settled at random
+    sort_key = (
+        points * 10**8
+        + (goal_diff + 10**4) * 10**4
+        + goals_for
+        + rng.random((n_sims, n_teams)) / 2
+    )
+    positions = np.argsort(np.argsort(-sort_key, axis=1), axis=1)
+    position_counts = np.bincount(
+        (np.arange(n_teams) * n_teams + positions).ravel(), minlength=n_teams**2
+    ).reshape(n_teams, n_teams)
+    return position_counts, points.sum(axis=0), goal_diff.sum(axis=0)
+
+
+@instrument()
+def simulate_season(
+    model,
+    fixtures: pd.DataFrame,
+    table: pd.DataFrame = None,
+    n_sims: int = 100000,
+    chunk_size: int = 10000,
+    seed=None,
+    max_workers: int = 1,
+    top_n: int = 4,
+    n_relegated: int = 3,
+    max_goals: int = 10,
+) -> pd.DataFrame:
+    """
+    Simulates the rest of the season n_sims times from the remaining fixtures (HomeTeam, AwayTeam) and the
+    current table (from league_table, teams missing from it start on zero). model is a DixonColesModel or a
+    parameter dictionary.
+    Seasons are played chunk_size at a time so memory doesn't grow with n_sims, each chunk with its own
+    child of the seed so the answer is the same however many workers there are. max_workers=1 runs in this
+    process, anything else fans the chunks out over a process pool (None for every core).
+    Returns each team's expected points, goal difference and position with their title, top_n and relegation
+    probabilities, plus the probability of every final position
+    """
+    tensor = dixon_coles_simulate_matches(
+        model, fixtures["HomeTeam"], fixtures["AwayTeam"], max_goals=max_goals
+    )
+    n_goals = max_goals + 1
+    cdf = np.cumsum(tensor.reshape(len(tensor), -1), axis=1)
+    # the tensor is cut off at max_goals so each fixture's distribution is renormalised
+    cdf = cdf / cdf[:, -1:] + np.arange(len(tensor))[:, None]
+
+    if table is None:
+        table = pd.DataFrame(columns=TABLE_COLUMNS, dtype=np.int64)
+    teams = np.sort(
+        pd.concat([fixtures["HomeTeam"], fixtures["AwayTeam"], table.index.to_series()])
+        .unique()
+        .astype(str)
+    )
+    team_idx = pd.Index(teams)
+    home_idx = team_idx.get_indexer(fixtures["HomeTeam"])
+    away_idx = team_idx.get_indexer(fixtures["AwayTeam"])
+    state = {
+        "cdf": cdf.ravel(),
+        "n_goals": n_goals,
+        "home_idx": home_idx,
+        "home_onehot": np.eye(len(teams))[home_idx],
+        "away_onehot": np.eye(len(teams))[away_idx],
+        "initial": table.reindex(teams)[TABLE_COLUMNS]
+        .fillna(0)
+        .to_numpy(dtype=np.float64),
+    }
+
+    chunk_sizes = [chunk_size] * (n_sims // chunk_size)
+    if n_sims % chunk_size:
+        chunk_sizes.append(n_sims % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if max_workers == 1:
+        results = [
+            _simulate_chunk(seed_seq, size, state)
+            for seed_seq, size in zip(seeds, chunk_sizes)
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(state,)
+        ) as executor:
+            results = list(executor.map(_simulate_chunk, seeds, chunk_sizes))
+
+    position_counts = sum(result[0] for result in results)
+    position_probs = position_counts / n_sims
+    n_teams = len(teams)
+    output = pd.DataFrame(
+        {
+            "exp_points": sum(result[1] for result in results) / n_sims,
+            "exp_goal_diff": sum(result[2] for result in results) / n_sims,
+            "exp_position": position_probs @ np.arange(1, n_teams + 1),
+            "title": position_probs[:, 0],
+            f"top_{top_n}": position_probs[:, :top_n].sum(axis=1),
+            "relegation": position_probs[:, n_teams - n_relegated :].sum(axis=1),
+        },
+        index=pd.Index(teams, name="team"),
+    )
+    output[[f"pos_{i}" for i in range(1, n_teams + 1)]] = position_probs
+    return output.sort_values("exp_position")
@@ -1,4 +1,5 @@
 from typing import Dict
+import time
 import pandas as pd
 import numpy as np
 from datetime import date
@@ -8,9 +9,16 @@ from bettools import (
     generate_seasons,
 )
 import warnings
+from dc_model import DixonColesModel
+from match_store import append_matches
+from model_registry import dataset_hash, latest_meta, save_model
+from fit_cache import solve_parameters_cached
+from ensemble import as_models, model_probs
+from profiling import instrument, n_rows
 from dixon_coles import (
     make_betting_prediction,
-    solve_parameters_decay,
+    make_betting_predictions,
+    params_to_dict,
 )
 
 from config import current_season
@@ -28,9 +36,10 @@ def whole_thing(start_year: int, end_year: int, leagues: list[str]) -> None:
 
     season_list = generate_seasons(start_year, end_year)
 
-    df_ls = get_data(season_list, leagues, additional_cols=["HS", "AS", "FTR"])
+    main_df = get_data(season_list, leagues, additional_cols=["HS", "AS", "FTR"])
 
-    main_df = pd.concat(df_ls)
+    # keep a columnar copy of everything played so far for backtests and refits
+    append_matches(main_df)
 
     main_df = main_df[-500:]
 
@@ -40,15 +49,38 @@ def whole_thing(start_year: int, end_year: int, leagues: list[str]) -> None:
     main_df["time_diff"] = (max(main_df["Date"]) - main_df["Date"]).dt.days
     main_df = main_df[["HomeTeam", "AwayTeam", "FTHG", "FTAG", "FTR", "time_diff"]]
 
-    params = solve_parameters_decay(main_df, xi=0.00325)
+    xi = 0.00325
+    data_hash = dataset_hash(main_df)
+    fit_start = time.perf_counter()
+    # an unchanged window (eg no new fixtures since the last run) comes straight from the fit cache
+    opt_output = solve_parameters_cached(main_df, xi=xi, debug=True)
+    fit_time = time.perf_counter() - fit_start
+    params = params_to_dict(np.sort(main_df["HomeTeam"].unique()), opt_output.x)
 
     print("params")
     print(params)
 
-    pdf_params = pd.DataFrame(list(params.items()), columns=["team", "output"])
-
-    print(f"saving to output {start_year}{end_year}{leagues[0]}")
-    pdf_params.to_csv(f"data/models/model{start_year}{end_year}{leagues[0]}.csv")
+    latest = latest_meta(leagues[0], start_year, end_year)
+    if latest is not None and (latest.get("data_hash"), latest.get("xi")) == (
+        data_hash,
+        xi,
+    ):
+        print(f"the registry already has this model {start_year}{end_year}{leagues[0]}")
+        return
+
+    print(f"saving to the model registry {start_year}{end_year}{leagues[0]}")
+    save_model(
+        DixonColesModel.from_params_dict(params),
+        leagues[0],
+        start_year,
+        end_year,
+        xi=xi,
+        n_matches=len(main_df),
+        fit_time=fit_time,
+        log_likelihood=-opt_output.fun,
+        converged=bool(opt_output.success),
+        data_hash=data_hash,
+    )
 
 
 def prep_params(pdf: pd.DataFrame) -> pd.DataFrame:
@@ -68,93 +100,85 @@ def combined_prediction(
     away_team: str,
 ) -> None:
     """
-    Predictions are generated for both timeframes in terms of what the result is and how much is recommended to bet on it
+    Predictions are generated for every model in terms of what the result is and how much is recommended to bet on it.
+    With the usual two models this is (last 2 seasons output, magnitude, this season output, magnitude)
     """
 
-    params_last_2_seasons, params_this_season = params_list
-
-    pred_last_2_seasons = make_betting_prediction(
-        home_odds=home_odds,
-        draw_odds=draw_odds,
-        away_odds=away_odds,
-        params=params_last_2_seasons,
-        home_team=home_team,
-        away_team=away_team,
-    )
-
-    pred_this_season = make_betting_prediction(
-        home_odds=home_odds,
-        draw_odds=draw_odds,
-        away_odds=away_odds,
-        params=params_this_season,
-        home_team=home_team,
-        away_team=away_team,
-    )
+    predictions = [
+        make_betting_prediction(
+            home_odds=home_odds,
+            draw_odds=draw_odds,
+            away_odds=away_odds,
+            params=params,
+            home_team=home_team,
+            away_team=away_team,
+        )
+        for params in params_list
+    ]
 
-    (
-        pred_last_2_seasons_output,
-        pred_last_2_seasons_magnitude,
-        pred_this_season_output,
-        pred_this_season_magnitude,
-    ) = output_results(pred_last_2_seasons, pred_this_season)
-    return (
-        pred_last_2_seasons_output,
-        pred_last_2_seasons_magnitude,
-        pred_this_season_output,
-        pred_this_season_magnitude,
-    )
+    return output_results(*predictions)
 
 
-def output_results(pred_last_2_seasons, pred_this_season) -> None:
+def output_results(*predictions) -> None:
     """
-    The outputs are combined into a dataframe where if the outputs are the same it's recommended to bet, where the amount is defined for each
+    The (output, magnitude) pair of each model flattened into one tuple, in model order
     """
 
-    pred_last_2_seasons_output, pred_last_2_seasons_magnitude = pred_last_2_seasons
-    pred_this_season_output, pred_this_season_magnitude = pred_this_season
+    return tuple(value for prediction in predictions for value in prediction)
 
-    return (
-        pred_last_2_seasons_output,
-        pred_last_2_seasons_magnitude,
-        pred_this_season_output,
-        pred_this_season_magnitude,
-    )
 
+# the names the two models have always had in the output columns
+LEGACY_MODEL_NAMES = ["last_2_seasons", "this_season"]
 
-def predict_whole_league(df: pd.DataFrame, params_list: list[dict]) -> None:
+
+@instrument(items=n_rows)
+def predict_fixtures(
+    df: pd.DataFrame,
+    params_list: list,
+    model_names: list[str] = None,
+    bankroll=100,
+    kelly_fraction=0.05,
+) -> pd.DataFrame:
     """
-    For every game in the odds list, the prediction is generated for it and printed
+    Prices every fixture (home, away, home_odds, draw_odds, away_odds columns) with every model in one
+    batch per model. Returns a tidy frame with a row per fixture and model
     """
+    if model_names is None:
+        model_names = [f"model_{i}" for i in range(len(params_list))]
+    n_models, n_fixtures = len(params_list), len(df)
+
+    # every model's probabilities come from one batched score tensor
+    probs = model_probs(as_models(params_list), df["home"], df["away"]).reshape(-1, 3)
+    prediction = make_betting_predictions(
+        {"H": probs[:, 0], "D": probs[:, 1], "A": probs[:, 2]},
+        np.tile(df["home_odds"].to_numpy(), n_models),
+        np.tile(df["draw_odds"].to_numpy(), n_models),
+        np.tile(df["away_odds"].to_numpy(), n_models),
+        bankroll=bankroll,
+        kelly_fraction=kelly_fraction,
+    )
+    prediction.insert(0, "model", np.repeat(model_names, n_fixtures))
+    prediction.insert(0, "away", np.tile(df["away"].to_numpy(), n_models))
+    prediction.insert(0, "home", np.tile(df["home"].to_numpy(), n_models))
+    prediction.insert(0, "fixture", np.tile(np.arange(n_fixtures), n_models))
+    return prediction
 
-    pred_last_2_seasons_output_list = []
-    pred_last_2_seasons_magnitude_list = []
-    pred_this_season_output_list = []
-    pred_this_season_magnitude_list = []
-
-    for i in range(len(df)):
-        (
-            pred_last_2_seasons_output,
-            pred_last_2_seasons_magnitude,
-            pred_this_season_output,
-            pred_this_season_magnitude,
-        ) = combined_prediction(
-            df["home_odds"][i],
-            df["draw_odds"][i],
-            df["away_odds"][i],
-            params_list,
-            df["home"][i],
-            df["away"][i],
-        )
 
-        pred_last_2_seasons_output_list.append(pred_last_2_seasons_output)
-        pred_last_2_seasons_magnitude_list.append(pred_last_2_seasons_magnitude)
-        pred_this_season_output_list.append(pred_this_season_output)
-        pred_this_season_magnitude_list.append(pred_this_season_magnitude)
+def predict_whole_league(df: pd.DataFrame, params_list: list[dict]) -> None:
+    """
+    For every game in the odds list, the prediction is generated for it and added as
+    pred_{model}_output / pred_{model}_magnitude columns
+    """
+    model_names = (
+        LEGACY_MODEL_NAMES
+        if len(params_list) == len(LEGACY_MODEL_NAMES)
+        else [f"model_{i}" for i in range(len(params_list))]
+    )
+    predictions = predict_fixtures(df, params_list, model_names=model_names)
 
-    df["pred_last_2_seasons_output"] = pred_last_2_seasons_output_list
-    df["pred_last_2_seasons_magnitude"] = pred_last_2_seasons_magnitude_list
-    df["pred_this_season_output"] = pred_this_season_output_list
-    df["pred_this_season_magnitude"] = pred_this_season_magnitude_list
+    for name, prediction in predictions.groupby("model", sort=False):
+        df[f"pred_{name}_output"] = prediction["selection"].to_numpy()
+        df[f"pred_{name}_magnitude"] = prediction["stake"].to_numpy()
 
     return df
 
@@ -163,80 +187,22 @@ def save_data(start_year, end_year, league_list, additional_cols=[]):
 
     season_list = generate_seasons(start_year, end_year)
 
-    col_list = [
-        "Div",
-        "Date",
-        "HomeTeam",
-        "AwayTeam",
-        "FTHG",
-        "FTAG",
-        "PSH",
-        "PSD",
-        "PSA",
-        "home_max_odds",
-        "away_max_odds",
-        "draw_max_odds",
+    return get_data(season_list, league_list, additional_cols=additional_cols)
+
+
+def output_result_column(df, weights=None):
+    """
+    Recommends a bet where every model's pred_*_output agrees, staking the (weighted) average of their magnitudes
+    """
+    output_cols = [
+        col for col in df.columns if col.startswith("pred_") and col.endswith("_output")
     ]
+    magnitude_cols = [col[: -len("_output")] + "_magnitude" for col in output_cols]
 
-    for col in additional_cols:
-        col_list.append(col)
-
-    df_ls = []
-
-    bookmakers = ["B365", "BW", "IW", "PS", "WH", "VC"]
-
-    home_cols = []
-    away_cols = []
-    draw_cols = []
-
-    for book in bookmakers:
-        home_col = book + "H"
-        home_cols.append(home_col)
-
-    for book in bookmakers:
-        away_col = book + "A"
-        away_cols.append(away_col)
-
-    for book in bookmakers:
-        draw_col = book + "D"
-        draw_cols.append(draw_col)
-
-    for season in season_list:
-        for league in league_list:
-            try:
-                df = pd.read_csv(
-                    f"https://www.football-data.co.uk/mmz4281/{season}/{league}.csv"
-                )
-            except:
-                df = pd.read_csv(
-                    f"https://www.football-data.co.uk/mmz4281/{season}/{league}.csv",
-                    encoding="latin",
-                )
-            try:
-                df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%y")
-            except ValueError:
-                df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-            existing_home_columns = [col for col in home_cols if col in df.columns]
-            existing_away_columns = [col for col in away_cols if col in df.columns]
-            existing_draw_columns = [col for col in draw_cols if col in df.columns]
-
-            df["home_max_odds"] = df[existing_home_columns].max(axis=1)
-            df["away_max_odds"] = df[existing_away_columns].max(axis=1)
-            df["draw_max_odds"] = df[existing_draw_columns].max(axis=1)
-
-            df = df[col_list]
-            df_ls.append(df)
-    return df_ls
-
-
-def output_result_column(df):
-    df["bet_bool"] = np.where(
-        df["pred_last_2_seasons_output"] == df["pred_this_season_output"], 1, 0
-    )
-    df["average_bet_coefficient"] = (
-        df["bet_bool"]
-        * (df["pred_last_2_seasons_magnitude"] + df["pred_this_season_magnitude"])
-        * 0.5
+    outputs = df[output_cols].to_numpy()
+    df["bet_bool"] = np.where((outputs == outputs[:, :1]).all(axis=1), 1, 0)
+    df["average_bet_coefficient"] = df["bet_bool"] * np.average(
+        df[magnitude_cols].to_numpy(), axis=1, weights=weights
     )
 
     return df
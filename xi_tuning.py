@@ -0,0 +1,201 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize_scalar
+
+from dc_likelihood import encode_matches, match_weights
+from dc_model import DixonColesModel
+from dixon_coles import (
+    fit_encoded,
+    params_to_dict,
+    split_temp_model,
+    warm_start_params,
+)
+from markets import outcome_probs
+
+# the blocks of days the model is tested on, the same as get_total_score_xi
+DAYS = range(99, -1, -3)
+
+RESULT_CODES = {"H": 0, "D": 1, "A": 2}
+
+# Each worker process holds the encoded splits so only the xi values are sent per task
+_worker_state = {}
+
+
+def prepare_splits(dataset: pd.DataFrame, days=DAYS) -> list[dict]:
+    """
+    Splits and encodes the training and test matches for every block of days.
+    None of this depends on xi so it's done once and reused for every xi evaluated.
+    Test matches with a team that isn't in the training data can't be predicted and are dropped
+    """
+    splits = []
+    for day in days:
+        train_dataset, test_dataset = split_temp_model(dataset, day)
+        if len(test_dataset) == 0 or len(train_dataset) == 0:
+            continue
+        teams = np.sort(
+            pd.concat([train_dataset["HomeTeam"], train_dataset["AwayTeam"]]).unique()
+        )
+        test_home = pd.Index(teams).get_indexer(test_dataset["HomeTeam"])
+        test_away = pd.Index(teams).get_indexer(test_dataset["AwayTeam"])
+        known = (test_home >= 0) & (test_away >= 0)
+        splits.append(
+            {
+                "day": day,
+                "matches": encode_matches(train_dataset, teams=teams),
+                "test_home": test_home[known],
+                "test_away": test_away[known],
+                "test_result": test_dataset["FTR"].map(RESULT_CODES).to_numpy()[known],
+            }
+        )
+    return splits
+
+
+def _init_vals(previous: dict, teams):
+    if previous is None:
+        return None
+    return warm_start_params(previous, teams)
+
+
+def score_xi(
+    splits: list[dict],
+    xi: float,
+    warm_starts: list[dict] = None,
+    options={"disp": False, "maxiter": 100},
+):
+    """
+    Fits every split with time decay xi and scores its test matches.
+    Each fit is warm started from warm_starts (eg the same split fitted with a neighbouring xi) if given,
+    otherwise from the previous split's fit. Returns the per split results and fitted parameters
+    """
+    rows = []
+    fitted = []
+    previous = None
+    for i, split in enumerate(splits):
+        matches = split["matches"]
+        n_teams = matches.n_teams
+        if warm_starts is not None:
+            previous = warm_starts[i]
+        opt_output = fit_encoded(
+            matches,
+            match_weights(matches, xi=xi),
+            init_vals=_init_vals(previous, matches.teams),
+            options=options,
+        )
+        model = DixonColesModel(
+            matches.teams,
+            opt_output.x[:n_teams],
+            opt_output.x[n_teams : (2 * n_teams)],
+            opt_output.x[-2],
+            opt_output.x[-1],
+        )
+        probs_1x2 = outcome_probs(
+            model.score_tensor(split["test_home"], split["test_away"])
+        )
+        probs = np.stack([probs_1x2["H"], probs_1x2["D"], probs_1x2["A"]], axis=1)
+        score = np.sum(np.log(probs[np.arange(len(probs)), split["test_result"]]))
+
+        rows.append(
+            {
+                "xi": xi,
+                "day": split["day"],
+                "n_test": len(split["test_result"]),
+                "score": score,
+                "nit": opt_output.nit,
+                "success": opt_output.success,
+            }
+        )
+        previous = params_to_dict(matches.teams, opt_output.x)
+        fitted.append(previous)
+    return rows, fitted
+
+
+def _init_worker(splits: list[dict]) -> None:
+    _worker_state["splits"] = splits
+
+
+def _score_block(xi_values) -> list[dict]:
+    """
+    Scores a run of neighbouring xi values in order, warm starting each from the one before
+    """
+    rows = []
+    fitted = None
+    for xi in xi_values:
+        xi_rows, fitted = score_xi(_worker_state["splits"], xi, warm_starts=fitted)
+        rows.extend(xi_rows)
+    return rows
+
+
+def summarise_xi(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    The total predictive score for each xi, best first
+    """
+    return (
+        results.groupby("xi", as_index=False)
+        .agg(score=("score", "sum"), nit=("nit", "sum"))
+        .sort_values("score", ascending=False, ignore_index=True)
+    )
+
+
+def tune_xi(
+    dataset: pd.DataFrame,
+    xi_grid,
+    days=DAYS,
+    max_workers: int = None,
+    output_path="data/xi_tuning/xi_results.csv",
+) -> pd.DataFrame:
+    """
+    Evaluates a grid of xi values across a pool of processes and writes every (xi, day) result to one csv.
+    The grid is split into contiguous runs so each worker can warm start between neighbouring values
+    """
+    splits = prepare_splits(dataset, days)
+    xi_grid = np.sort(np.asarray(xi_grid, dtype=float))
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    blocks = [block for block in np.array_split(xi_grid, max_workers) if len(block) > 0]
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(splits,)
+    ) as executor:
+        results = pd.DataFrame(
+            [row for rows in executor.map(_score_block, blocks) for row in rows]
+        )
+
+    if output_path is not None:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        results.to_csv(output_path, index=False)
+    print(f"best xi on the grid is {summarise_xi(results)['xi'][0]}")
+    return results
+
+
+def search_xi(
+    dataset: pd.DataFrame,
+    bounds=(0.0, 0.01),
+    days=DAYS,
+    xatol: float = 1e-4,
+    output_path="data/xi_tuning/xi_search.csv",
+):
+    """
+    Finds the best xi with a bounded scalar search rather than a grid.
+    Every evaluation warm starts from the one before, which is usually a nearby xi.
+    Returns the best xi and the results of every evaluation
+    """
+    splits = prepare_splits(dataset, days)
+    results = []
+    fitted = [None]
+
+    def negative_score(xi):
+        rows, fitted[0] = score_xi(splits, xi, warm_starts=fitted[0])
+        results.extend(rows)
+        return -sum(row["score"] for row in rows)
+
+    opt_output = minimize_scalar(
+        negative_score, bounds=bounds, method="bounded", options={"xatol": xatol}
+    )
+    results = pd.DataFrame(results)
+    if output_path is not None:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        results.to_csv(output_path, index=False)
+    return opt_output.x, results